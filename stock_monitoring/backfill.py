@@ -0,0 +1,157 @@
+"""
+過去レポート再生成（バックフィル）モジュール
+全銘柄の価格履歴を1回だけ取得し、過去N週それぞれの時点の価格変動・テクニカル指標を
+終値パネルから一括計算して、週ごとのレポートをワーカープロセスで並列に描画します
+
+各週のレポートは、その週のレポート実行日（scheduleの曜日・時刻）より前の終値だけを使います。
+会社情報（時価総額・PERなど）は過去の値を取得できないため、現在の値を使います。
+"""
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import pandas as pd
+
+from indicators import IndicatorState, to_indicator_dicts
+from price_panel import compute_price_changes, to_change_dicts
+from report_runner import create_report_generator, write_report
+from stock_record import FIELD_KEYS, StockRecord
+
+# 取得に使うyfinanceの期間と、その日数
+HISTORY_PERIODS = (('2y', 730), ('5y', 1826), ('10y', 3652))
+
+WEEKDAYS = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+
+
+def backfill_period(weeks: int) -> str:
+    """
+    weeks週分のレポートに必要な価格履歴の取得期間
+
+    最も古い週のレポートにも1年分のチャートと1年変動率が必要なため、1年 + weeks週を含む
+    最短の期間を選びます。
+    """
+    needed_days = 366 + 7 * weeks
+    for period, days in HISTORY_PERIODS:
+        if days >= needed_days:
+            return period
+    return 'max'
+
+
+def report_times(weeks: int, day_of_week: str = 'monday', time_str: str = '09:00',
+                 now: Optional[datetime] = None) -> List[datetime]:
+    """
+    直近weeks回分の週次レポートの実行日時（古い順）
+
+    Args:
+        weeks: 週数
+        day_of_week: レポートを生成する曜日（dailyなど曜日以外の場合は今日の曜日）
+        time_str: レポートを生成する時刻（HH:MM）
+        now: 基準の日時（省略時は現在時刻）
+
+    Returns:
+        now以前の直近weeks回の実行日時
+    """
+    now = now or datetime.now()
+    hour, minute = (int(part) for part in time_str.split(':')[:2])
+    weekday = WEEKDAYS.index(day_of_week) if day_of_week in WEEKDAYS else now.weekday()
+
+    latest = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    latest -= timedelta(days=(latest.weekday() - weekday) % 7)
+    if latest > now:
+        latest -= timedelta(days=7)
+    return [latest - timedelta(weeks=k) for k in reversed(range(weeks))]
+
+
+def full_close_panel(histories: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    取得した全期間の価格履歴から終値パネルを作成する（インデックスは現地日付）
+
+    Returns:
+        日付 × ティッカーのDataFrame
+    """
+    series = {}
+    for ticker, history in histories.items():
+        if history is None or history.empty:
+            continue
+        close = history['Close']
+        if getattr(close.index, 'tz', None) is not None:
+            close = close.tz_localize(None)
+        series[ticker] = close
+    if not series:
+        return pd.DataFrame(dtype=float)
+    return pd.DataFrame(series).sort_index()
+
+
+def as_of_week(close: pd.DataFrame, stocks_data: List[Dict], report_time: datetime,
+               state: IndicatorState) -> Tuple[List[Dict], List[Dict], Dict[str, Dict], pd.DataFrame]:
+    """
+    report_time時点の株価データ・価格変動・テクニカル指標を作成する
+
+    価格変動はreport_timeより前の1年分のパネルからcompute_price_changes()で一括計算します。
+    テクニカル指標はstateに前の週からの差分だけを追加して計算するため、週を古い順に
+    呼び出してください。
+
+    Args:
+        close: full_close_panel()の結果
+        stocks_data: 取得した株価データ（会社情報に使う）
+        report_time: レポートの実行日時
+        state: テクニカル指標の計算状態（週をまたいで使い回す）
+
+    Returns:
+        (株価データ, 価格変動, テクニカル指標, その時点の1年分の終値パネル)
+    """
+    history = close.loc[close.index < pd.Timestamp(report_time.date())]
+    if history.empty:
+        return [], [], {}, history
+    year_start = history.index[-1] - pd.DateOffset(years=1)
+    window = history.loc[history.index >= year_start].dropna(axis=1, how='all')
+
+    state.update(history)
+    indicator_frame = state.results().reindex(window.columns)
+
+    week_stocks = []
+    for stock_data in stocks_data:
+        ticker = stock_data.get('ticker')
+        if 'error' in stock_data:
+            week_stocks.append(stock_data)
+            continue
+        if ticker not in window.columns:
+            continue
+        series = window[ticker].dropna()
+        fields = {key: stock_data.get(key) for key in FIELD_KEYS}
+        fields.update({
+            'current_price': float(series.iloc[-1]),
+            '52_week_high': float(series.max()),
+            '52_week_low': float(series.min()),
+            'fetched_at': report_time.isoformat(),
+        })
+        n = len(series)
+        month_start = int((series.index < series.index[-1] - pd.DateOffset(months=1)).sum())
+        week_stocks.append(StockRecord(
+            fields, series.index, series.to_numpy(dtype='float32'),
+            week_start=n - min(n, 5), month_start=month_start
+        ))
+
+    changes = compute_price_changes(window)
+    price_changes = to_change_dicts(changes, week_stocks)
+    return week_stocks, price_changes, to_indicator_dicts(indicator_frame), window
+
+
+def render_week(config: dict, report_time: datetime, stocks_data: List[Dict],
+                price_changes: List[Dict], indicators: Dict[str, Dict],
+                correlation: Optional[Dict] = None,
+                comparison: Optional[Dict] = None) -> Optional[str]:
+    """
+    1週分のレポートを書き出す（ワーカープロセスで実行する）
+
+    チャートは週ごとに1つのワーカーが逐次描画するため、chart_workersは使いません。
+
+    Returns:
+        生成したレポートのパス
+    """
+    generator = create_report_generator(config, report_time=report_time, chart_workers=1)
+    try:
+        return write_report(
+            generator, config.get('report', {}) or {}, stocks_data, price_changes,
+            indicators, correlation, comparison=comparison
+        )
+    finally:
+        generator.close()
@@ -0,0 +1,82 @@
+"""
+起動時間ベンチマーク
+main.py のインポート時間と、読み込まれる重いモジュールを計測します
+
+使用方法:
+    python benchmarks/bench_import.py [--runs 10]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ['yfinance', 'pandas', 'numpy', 'matplotlib', 'seaborn', 'jinja2']
+
+# 計測するインポートのパターン（名前 -> 実行するコード）
+SCENARIOS = {
+    # スケジューラーのみ起動する場合（main.pyの読み込みだけ）
+    'main': "import main",
+    # レポート生成に必要なモジュールをすべて読み込む場合（遅延読み込み前の main.py 相当）
+    'main+report': "import main, stock_data_fetcher, report_generator",
+}
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - start
+import json
+print(json.dumps({{
+    'seconds': elapsed,
+    'loaded': [name for name in {heavy!r} if name in sys.modules],
+}}))
+"""
+
+
+def measure(code: str, runs: int) -> dict:
+    """
+    新しいPythonプロセスでcodeを実行し、インポート時間を計測する
+
+    Args:
+        code: 計測するインポート文
+        runs: 計測回数
+
+    Returns:
+        中央値・最小値（秒）と読み込まれた重いモジュールの辞書
+    """
+    samples = []
+    loaded = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE.format(code=code, heavy=HEAVY_MODULES)],
+            cwd=PACKAGE_DIR, capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        samples.append(result['seconds'])
+        loaded = result['loaded']
+    return {
+        'median_seconds': statistics.median(samples),
+        'min_seconds': min(samples),
+        'heavy_modules_loaded': loaded,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="main.py の起動時間を計測します")
+    parser.add_argument("--runs", type=int, default=10, help="各パターンの計測回数")
+    args = parser.parse_args()
+
+    results = {name: measure(code, args.runs) for name, code in SCENARIOS.items()}
+    for name, result in results.items():
+        print(f"{name:<12} median {result['median_seconds'] * 1000:8.1f} ms  "
+              f"min {result['min_seconds'] * 1000:8.1f} ms  "
+              f"loaded: {', '.join(result['heavy_modules_loaded']) or '-'}")
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+レポート生成パイプラインのベンチマーク
+疑似的なyfinance（fake_yfinance.py）を使い、ネットワークに接続せずに各処理の
+実行時間とピークメモリを銘柄数ごとに計測します
+
+計測する処理:
+    get_multiple_stocks     株価データの取得
+    calculate_price_change  全銘柄の価格変動の計算
+    _generate_charts        チャートの描画
+    generate_html_report    HTMLレポートの生成（チャートの描画を含む）
+
+ピークメモリはtracemallocで計測するため、実行時間にはその分のオーバーヘッドが含まれます
+（--no-memory で無効化できます）。ベースラインは実行環境ごとに異なるため、
+デプロイ先と同じ環境で --update-baseline を付けて記録してください。
+
+使用方法:
+    python benchmarks/bench_pipeline.py [--sizes 10 100 1000 5000] [--latency 0.0]
+        [--chart-workers 1] [--chart-backend png] [--baseline benchmarks/baseline.json] [--update-baseline]
+        [--tolerance 0.25]
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, Tuple
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PACKAGE_DIR)
+
+from fake_yfinance import FakeYFinance  # noqa: E402
+from report_generator import ReportGenerator  # noqa: E402
+from stock_data_fetcher import StockDataFetcher  # noqa: E402
+
+DEFAULT_SIZES = [10, 100, 1000, 5000]
+DEFAULT_BASELINE = os.path.join(PACKAGE_DIR, "benchmarks", "baseline.json")
+
+# 小さすぎる差は誤差として回帰とみなさない（秒 / MB）
+MIN_REGRESSION = {'seconds': 0.05, 'peak_mb': 1.0}
+
+
+def measure(func: Callable, trace_memory: bool) -> Tuple[object, Dict]:
+    """
+    funcを実行し、実行時間とピークメモリを計測する
+
+    Returns:
+        (funcの戻り値, {'seconds': 実行時間, 'peak_mb': ピークメモリ})
+    """
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = func()
+        seconds = time.perf_counter() - start
+        peak_mb = tracemalloc.get_traced_memory()[1] / 1024 / 1024 if trace_memory else None
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+    return result, {'seconds': round(seconds, 4),
+                    'peak_mb': None if peak_mb is None else round(peak_mb, 2)}
+
+
+def run_size(size: int, args: argparse.Namespace) -> Dict[str, Dict]:
+    """size件の銘柄で各処理を計測する"""
+    provider = FakeYFinance(latency_seconds=args.latency)
+    tickers = provider.tickers(size)
+    fetcher = StockDataFetcher(max_workers=args.fetch_workers)
+    results = {}
+
+    with provider.install(), tempfile.TemporaryDirectory() as output_dir:
+        generator = ReportGenerator(output_dir=output_dir, chart_workers=args.chart_workers,
+                                    chart_backend=args.chart_backend)
+        try:
+            stocks_data, results['get_multiple_stocks'] = measure(
+                lambda: fetcher.get_multiple_stocks(tickers), args.memory
+            )
+            price_changes, results['calculate_price_change'] = measure(
+                lambda: [fetcher.calculate_price_change(stock_data) for stock_data in stocks_data],
+                args.memory
+            )
+            _, results['_generate_charts'] = measure(
+                lambda: generator._generate_charts(stocks_data), args.memory
+            )
+            _, results['generate_html_report'] = measure(
+                lambda: generator.generate_html_report(stocks_data, price_changes), args.memory
+            )
+        finally:
+            generator.close()
+            fetcher.close()
+
+    return results
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> list:
+    """
+    ベースラインと比較し、悪化した項目を返す
+
+    Returns:
+        (銘柄数, 処理名, 指標, ベースラインの値, 今回の値) のリスト
+    """
+    regressions = []
+    for size, stages in results.items():
+        for stage, metrics in stages.items():
+            base_metrics = baseline.get(size, {}).get(stage, {})
+            for metric, value in metrics.items():
+                base_value = base_metrics.get(metric)
+                if value is None or base_value is None:
+                    continue
+                if (value > base_value * (1 + tolerance)
+                        and value - base_value > MIN_REGRESSION[metric]):
+                    regressions.append((size, stage, metric, base_value, value))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="レポート生成パイプラインの処理時間を計測します")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="計測する銘柄数")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="疑似APIの1回の呼び出しにかかる秒数")
+    parser.add_argument("--fetch-workers", type=int, default=8, help="同時に取得するティッカー数")
+    parser.add_argument("--chart-workers", type=int, default=1, help="チャートを並列描画するプロセス数")
+    parser.add_argument("--chart-backend", choices=["png", "svg"], default="png",
+                        help="チャートの形式")
+    parser.add_argument("--no-memory", dest="memory", action="store_false",
+                        help="ピークメモリを計測しない（実行時間のみ）")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="ベースラインのJSONファイル")
+    parser.add_argument("--update-baseline", action="store_true", help="今回の結果をベースラインとして保存する")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="回帰とみなす悪化率（0.25 で25%%）")
+    args = parser.parse_args()
+
+    # 銘柄ごとの取得ログは計測の妨げになるため抑える
+    logging.getLogger().setLevel(logging.WARNING)
+
+    settings = {
+        'latency': args.latency,
+        'fetch_workers': args.fetch_workers,
+        'chart_workers': args.chart_workers,
+        'chart_backend': args.chart_backend,
+        'memory': args.memory,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+    results = {}
+    for size in args.sizes:
+        results[str(size)] = run_size(size, args)
+        for stage, metrics in results[str(size)].items():
+            peak = "-" if metrics['peak_mb'] is None else f"{metrics['peak_mb']:9.1f} MB"
+            print(f"{size:>6} {stage:<24} {metrics['seconds']:10.3f} s  peak {peak}")
+
+    if args.update_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({'settings': settings, 'results': results}, f, indent=2)
+        print(f"ベースラインを保存しました: {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"ベースラインがありません（--update-baseline で作成します）: {args.baseline}")
+        return
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    changed = {key: (baseline['settings'].get(key), value) for key, value in settings.items()
+               if baseline['settings'].get(key) != value}
+    if changed:
+        print(f"警告: ベースラインと計測条件が異なります: {changed}")
+
+    regressions = compare(results, baseline['results'], args.tolerance)
+    for size, stage, metric, base_value, value in regressions:
+        print(f"回帰: {size}件 {stage} {metric}: {base_value} -> {value}")
+    if regressions:
+        sys.exit(1)
+    print("ベースラインからの回帰はありません")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+ベンチマーク用のyfinanceの代替
+ネットワークに接続せず、ティッカーごとに決まった疑似的な価格履歴と会社情報を返します
+
+同じティッカーには常に同じデータを返すため、計測結果を実行間で比較できます。
+latency_secondsを指定すると、APIの応答待ちを模して呼び出しごとに待機します。
+
+使用方法:
+    provider = FakeYFinance(latency_seconds=0.05)
+    with provider.install():
+        stocks_data = fetcher.get_multiple_stocks(provider.tickers(100))
+"""
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+import stock_data_fetcher
+
+# period指定と営業日数の対応
+PERIOD_DAYS = {
+    '1d': 1, '5d': 5, '1mo': 21, '3mo': 63, '6mo': 126,
+    '1y': 252, '2y': 504, '5y': 1260, 'max': 1260,
+}
+
+SECTORS = [
+    'Technology', 'Healthcare', 'Financial Services', 'Consumer Cyclical',
+    'Industrials', 'Energy', 'Utilities', 'Real Estate', 'Basic Materials',
+]
+
+
+class FakeTicker:
+    """yf.Tickerの代わりに疑似データを返すクラス"""
+
+    def __init__(self, ticker: str, provider: "FakeYFinance"):
+        self.ticker = ticker
+        self.provider = provider
+
+    @property
+    def info(self) -> Dict:
+        self.provider.wait()
+        return self.provider.make_info(self.ticker)
+
+    def history(self, period: Optional[str] = None, start=None, interval: str = "1d",
+                **kwargs) -> pd.DataFrame:
+        self.provider.wait()
+        return self.provider.make_history(self.ticker, period=period, start=start)
+
+
+class FakeYFinance:
+    """stock_data_fetcherが使うyfinanceの関数（Ticker / download）を差し替える疑似プロバイダ"""
+
+    def __init__(self, latency_seconds: float = 0.0, end_date: str = "2025-01-03",
+                 tz: str = "America/New_York"):
+        """
+        Args:
+            latency_seconds: 1回の呼び出しごとに待機する秒数（APIの応答時間の模擬）
+            end_date: 価格履歴の最終日
+            tz: 価格履歴のタイムゾーン
+        """
+        self.latency_seconds = latency_seconds
+        # 最長の期間分の営業日を用意し、periodやstartに応じて切り出す
+        self.dates = pd.bdate_range(end=end_date, periods=max(PERIOD_DAYS.values()), tz=tz)
+        self.calls = 0
+
+    @staticmethod
+    def tickers(count: int) -> List[str]:
+        """count件のティッカーシンボルを作成する"""
+        return [f"T{i:05d}" for i in range(count)]
+
+    def wait(self) -> None:
+        """APIの応答待ちを模して待機する"""
+        self.calls += 1
+        if self.latency_seconds > 0:
+            time.sleep(self.latency_seconds)
+
+    @staticmethod
+    def _rng(ticker: str, salt: int = 0) -> np.random.Generator:
+        # 実行間で変わらないシード（hash()はプロセスごとに変わるため使わない）
+        return np.random.default_rng(zlib.crc32(ticker.encode('utf-8')) + salt)
+
+    def make_history(self, ticker: str, period: Optional[str] = None,
+                     start=None) -> pd.DataFrame:
+        """
+        疑似的な日足のOHLCVを作成する
+
+        Args:
+            ticker: ティッカーシンボル
+            period: 取得期間（1y など）
+            start: 開始日（指定時はperiodより優先）
+
+        Returns:
+            yf.Ticker.history()と同じ列を持つDataFrame
+        """
+        rng = self._rng(ticker)
+        n = len(self.dates)
+        close = rng.uniform(10, 500) * np.exp(np.cumsum(rng.normal(0.0003, 0.02, n)))
+        open_ = close * (1 + rng.normal(0, 0.005, n))
+        high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.01, n)))
+        low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.01, n)))
+        history = pd.DataFrame({
+            'Open': open_,
+            'High': high,
+            'Low': low,
+            'Close': close,
+            'Volume': rng.integers(100_000, 10_000_000, n),
+            'Dividends': 0.0,
+            'Stock Splits': 0.0,
+        }, index=self.dates)
+
+        if start is not None:
+            return history.loc[history.index >= pd.Timestamp(start).tz_localize(self.dates.tz)]
+        return history.iloc[-PERIOD_DAYS.get(period or '1mo', 21):]
+
+    def make_info(self, ticker: str) -> Dict:
+        """疑似的な会社情報（yf.Ticker.infoと同じキー）を作成する"""
+        rng = self._rng(ticker, salt=1)
+        yearly = self.make_history(ticker, period='1y')['Close']
+        return {
+            'longName': f"{ticker} Holdings Inc.",
+            'shortName': f"{ticker} Holdings",
+            'sector': SECTORS[int(rng.integers(len(SECTORS)))],
+            'industry': 'Synthetic',
+            'currency': 'USD',
+            'marketCap': int(rng.integers(10**8, 10**12)),
+            'trailingPE': float(rng.uniform(5, 60)),
+            'dividendYield': float(rng.uniform(0, 0.05)),
+            'fiftyTwoWeekHigh': float(yearly.max()),
+            'fiftyTwoWeekLow': float(yearly.min()),
+            'longBusinessSummary': f"{ticker} is a synthetic company used for benchmarks.",
+            'website': f"https://example.com/{ticker.lower()}",
+            'fullTimeEmployees': int(rng.integers(10, 200_000)),
+        }
+
+    def Ticker(self, ticker: str) -> FakeTicker:
+        return FakeTicker(ticker, self)
+
+    def download(self, tickers, period: Optional[str] = None, start=None,
+                 group_by: str = 'ticker', **kwargs) -> pd.DataFrame:
+        """yf.download(group_by='ticker')と同じ横持ちのDataFrameを返す"""
+        self.wait()
+        if isinstance(tickers, str):
+            tickers = tickers.split()
+        frames = [self.make_history(ticker, period=period, start=start) for ticker in tickers]
+        return pd.concat(frames, axis=1, keys=list(tickers))
+
+    @contextmanager
+    def install(self):
+        """with文の中だけ、stock_data_fetcherが使うyfinanceをこのプロバイダに差し替える"""
+        original = stock_data_fetcher.yf
+        stock_data_fetcher.yf = self
+        try:
+            yield self
+        finally:
+            stock_data_fetcher.yf = original
@@ -0,0 +1,116 @@
+"""
+チャートキャッシュモジュール
+入力データと描画パラメータのハッシュをキーに、描画済みのチャート画像を再利用します
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Dict
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ChartCache:
+    """コンテンツアドレス方式のチャート画像キャッシュ"""
+
+    def __init__(self, cache_dir: str, max_age_days: float = 30, max_size_mb: float = 500,
+                 extension: str = ".png"):
+        """
+        Args:
+            cache_dir: キャッシュの保存先ディレクトリ
+            max_age_days: 最後に使われてからこの日数を過ぎたエントリを削除する
+            max_size_mb: キャッシュ全体の上限サイズ（超えた分は古いものから削除）
+            extension: 保存するファイルの拡張子
+        """
+        self.cache_dir = cache_dir
+        self.max_age_seconds = max_age_days * 86400
+        self.max_size_bytes = max_size_mb * 1024 * 1024
+        self.extension = extension
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(dates: np.ndarray, values: np.ndarray, params: Dict) -> str:
+        """
+        チャートの入力系列と描画パラメータからキャッシュキーを作成する
+
+        Args:
+            dates: 日付の配列
+            values: 値の配列
+            params: タイトルやサイズなど、出力に影響する描画パラメータ
+
+        Returns:
+            16進数のハッシュ文字列
+        """
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(np.ascontiguousarray(dates.astype('datetime64[ns]')).view(np.int64).tobytes())
+        digest.update(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+        digest.update(json.dumps(params, sort_keys=True, default=str).encode('utf-8'))
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + self.extension)
+
+    def fetch(self, key: str, dest_path: str) -> bool:
+        """
+        キャッシュにあればdest_pathへコピーする
+
+        Args:
+            key: make_key()で作成したキー
+            dest_path: コピー先のパス
+
+        Returns:
+            キャッシュにあった場合True
+        """
+        path = self._path(key)
+        if not os.path.exists(path):
+            return False
+        shutil.copyfile(path, dest_path)
+        # 最終使用時刻を更新する（期限切れ判定に使う）
+        os.utime(path)
+        return True
+
+    def store(self, key: str, src_path: str) -> None:
+        """描画したファイルをキャッシュに保存する"""
+        tmp_path = self._path(key) + ".tmp"
+        shutil.copyfile(src_path, tmp_path)
+        os.replace(tmp_path, self._path(key))
+
+    def evict(self) -> int:
+        """
+        期限切れのエントリと、上限サイズを超えた分の古いエントリを削除する
+
+        Returns:
+            削除したエントリ数
+        """
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(self.extension):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        entries.sort()
+        total_size = sum(size for _, size, _ in entries)
+        removed = 0
+        for mtime, size, path in entries:
+            if now - mtime < self.max_age_seconds and total_size <= self.max_size_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total_size -= size
+            removed += 1
+
+        if removed:
+            logger.info(f"チャートキャッシュから{removed}件を削除しました")
+        return removed
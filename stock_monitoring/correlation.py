@@ -0,0 +1,158 @@
+"""
+銘柄間相関モジュール
+終値パネルから日次リターンの相関を一括計算し、相関の高い銘柄ペアを抽出します
+
+リターンは銘柄ごとに標準化した float32 の行列（日付 × 銘柄）にまとめ、
+相関行列はその行列積で求めます。銘柄数が多い場合は block_size 銘柄ずつ計算して
+上位ペアだけを残すため、N × N の行列全体をメモリに持ちません。
+"""
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+
+def standardized_returns(close: pd.DataFrame,
+                         min_periods: int = 20) -> Tuple[np.ndarray, pd.Index]:
+    """
+    日次リターンを銘柄ごとに標準化する
+
+    休場日は前日の終値で埋め（リターン0）、上場前などデータの無い期間は0として扱います。
+    各列は平均0・二乗和1に正規化するため、列同士の内積がそのまま相関係数になります。
+
+    Args:
+        close: 日付 × ティッカーの終値パネル
+        min_periods: 相関の計算に必要なリターンの最小本数
+
+    Returns:
+        (標準化したリターンの行列（float32）, 対象になったティッカー)
+    """
+    returns = close.ffill().pct_change(fill_method=None).iloc[1:]
+    values = returns.to_numpy(dtype=np.float32)
+    valid = ~np.isnan(values)
+    counts = valid.sum(axis=0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.where(valid, values, 0).sum(axis=0) / counts
+        centered = np.where(valid, values - mean, 0).astype(np.float32)
+        norm = np.sqrt((centered ** 2).sum(axis=0))
+
+    keep = (counts >= min_periods) & (norm > 0)
+    return centered[:, keep] / norm[keep], close.columns[keep]
+
+
+def top_pairs(z: np.ndarray, tickers: pd.Index, k: int = 20,
+              block_size: int = 256) -> List[Tuple[str, str, float]]:
+    """
+    相関係数の高い銘柄ペアを上位k件まで抽出する
+
+    block_size銘柄 × 全銘柄の相関を順に計算し、各ブロックの上位だけを残します。
+    一度に確保するのは block_size × N の行列のみです。
+
+    Args:
+        z: standardized_returns()の行列
+        tickers: zの列に対応するティッカー
+        k: 抽出するペア数
+        block_size: 1回に計算する行数
+
+    Returns:
+        (ティッカー1, ティッカー2, 相関係数) のリスト（相関の高い順）
+    """
+    n = z.shape[1]
+    best_values = np.empty(0, dtype=np.float32)
+    best_pairs = np.empty((0, 2), dtype=np.int64)
+    columns = np.arange(n)
+
+    for start in range(0, n, block_size):
+        block = z[:, start:start + block_size].T @ z
+        rows = np.arange(start, start + block.shape[0])
+        # 同じペアを2回数えないよう、上三角（列 > 行）だけを対象にする
+        block[columns[None, :] <= rows[:, None]] = -np.inf
+
+        flat = block.ravel()
+        count = min(k, int(np.isfinite(flat).sum()))
+        if count == 0:
+            continue
+        candidates = np.argpartition(flat, -count)[-count:]
+        block_rows, block_cols = np.divmod(candidates, n)
+
+        best_values = np.concatenate([best_values, flat[candidates]])
+        best_pairs = np.concatenate([best_pairs, np.column_stack([rows[block_rows], block_cols])])
+        if len(best_values) > k:
+            keep = np.argpartition(best_values, -k)[-k:]
+            best_values, best_pairs = best_values[keep], best_pairs[keep]
+
+    order = np.argsort(-best_values)
+    return [
+        (tickers[i], tickers[j], float(np.clip(best_values[o], -1.0, 1.0)))
+        for o, (i, j) in zip(order, best_pairs[order])
+    ]
+
+
+def cluster_order(corr: np.ndarray) -> List[int]:
+    """
+    相関行列を平均連結法で階層クラスタリングし、似た銘柄が隣り合う並び順を返す
+
+    Args:
+        corr: 相関行列（N × N）
+
+    Returns:
+        行・列の並び順
+    """
+    n = len(corr)
+    if n <= 2:
+        return list(range(n))
+
+    similarity = corr.astype(float).copy()
+    np.fill_diagonal(similarity, -np.inf)
+    members = {i: [i] for i in range(n)}
+
+    for _ in range(n - 1):
+        a, b = np.unravel_index(np.argmax(similarity), similarity.shape)
+        a, b = min(a, b), max(a, b)
+        size_a, size_b = len(members[a]), len(members[b])
+        # 統合したクラスタと他のクラスタの類似度は、両クラスタの類似度の加重平均
+        merged = (size_a * similarity[a] + size_b * similarity[b]) / (size_a + size_b)
+        similarity[a, :] = merged
+        similarity[:, a] = merged
+        similarity[a, a] = -np.inf
+        similarity[b, :] = -np.inf
+        similarity[:, b] = -np.inf
+        members[a] = members[a] + members.pop(b)
+
+    return next(iter(members.values()))
+
+
+def analyze_correlation(close: pd.DataFrame, top_k: int = 20, matrix_max_tickers: int = 60,
+                        block_size: int = 256) -> Optional[Dict]:
+    """
+    ウォッチリストのリターン相関を分析する
+
+    Args:
+        close: 日付 × ティッカーの終値パネル（build_close_panel()の結果）
+        top_k: 抽出する相関の高いペア数
+        matrix_max_tickers: 相関行列（ヒートマップ用）を作成する銘柄数の上限
+        block_size: top_pairs()で1回に計算する行数
+
+    Returns:
+        ticker_count / periods / top_pairs / matrix（クラスタ順に並べた相関行列、
+        銘柄数が上限を超える場合はNone）の辞書。銘柄が2つ未満の場合はNone
+    """
+    if close.empty:
+        return None
+    z, tickers = standardized_returns(close)
+    if len(tickers) < 2:
+        return None
+
+    matrix = None
+    if len(tickers) <= matrix_max_tickers:
+        corr = np.clip(z.T @ z, -1.0, 1.0)
+        order = cluster_order(corr)
+        matrix = pd.DataFrame(corr[np.ix_(order, order)],
+                              index=tickers[order], columns=tickers[order])
+
+    return {
+        'ticker_count': len(tickers),
+        'periods': z.shape[0],
+        'top_pairs': top_pairs(z, tickers, k=top_k, block_size=block_size),
+        'matrix': matrix,
+    }
@@ -0,0 +1,191 @@
+"""
+テクニカル指標モジュール
+終値パネル（日付 × ティッカー）から全銘柄のテクニカル指標をベクトル演算で一括計算します
+
+計算する指標:
+    SMA / EMA（20・50・200日）、年率ボラティリティ、最大ドローダウン、
+    RSI（14日）、52週高値からの乖離率
+
+IndicatorState は直近の終値と EMA・RSI の途中状態を保持するため、
+新しい日足が追加されたときは update() でその分だけを計算できます。
+"""
+from typing import Dict, Optional
+import numpy as np
+import pandas as pd
+
+MA_WINDOWS = (20, 50, 200)
+RSI_PERIOD = 14
+TRADING_DAYS = 252
+
+# 保持する終値の本数（52週高値・ボラティリティ・SMA200の計算に使う）
+WINDOW_BARS = max(TRADING_DAYS, max(MA_WINDOWS)) + 1
+
+INDICATOR_COLUMNS = (
+    [f'sma_{w}' for w in MA_WINDOWS]
+    + [f'ema_{w}' for w in MA_WINDOWS]
+    + ['volatility_pct', 'max_drawdown_pct', f'rsi_{RSI_PERIOD}', 'from_52w_high_pct']
+)
+
+
+def _align_bottom(values: np.ndarray) -> np.ndarray:
+    """各列の有効値を順序を保ったまま下詰めにする（休場日のNaNは上に集まる）"""
+    order = np.argsort(~np.isnan(values), axis=0, kind='stable')
+    return np.take_along_axis(values, order, axis=0)
+
+
+class IndicatorState:
+    """全銘柄のテクニカル指標の計算状態"""
+
+    def __init__(self):
+        self.tickers = pd.Index([], dtype=object)
+        # 直近WINDOW_BARS本の終値（各列の有効値を下詰め）
+        self.window = np.empty((0, 0))
+        self.ema = {w: np.empty(0) for w in MA_WINDOWS}
+        self.bar_count = np.empty(0, dtype=int)
+        self.last_close = np.empty(0)
+        self.avg_gain = np.empty(0)
+        self.avg_loss = np.empty(0)
+        self.last_date = None
+
+    def _extend(self, tickers: pd.Index) -> None:
+        """新しいティッカーの状態を追加する"""
+        new = tickers.difference(self.tickers, sort=False)
+        if len(new) == 0:
+            return
+        k = len(new)
+        self.tickers = self.tickers.append(new)
+        self.window = np.hstack([self.window, np.full((len(self.window), k), np.nan)])
+        for w in MA_WINDOWS:
+            self.ema[w] = np.concatenate([self.ema[w], np.full(k, np.nan)])
+        self.bar_count = np.concatenate([self.bar_count, np.zeros(k, dtype=int)])
+        self.last_close = np.concatenate([self.last_close, np.full(k, np.nan)])
+        self.avg_gain = np.concatenate([self.avg_gain, np.zeros(k)])
+        self.avg_loss = np.concatenate([self.avg_loss, np.zeros(k)])
+
+    def update(self, close: pd.DataFrame) -> "IndicatorState":
+        """
+        終値を追加して状態を更新する
+
+        前回のupdate()までに追加した日付以前の行は無視されるため、
+        キャッシュから読み込んだ全期間のパネルをそのまま渡すこともできます。
+
+        Args:
+            close: 日付 × ティッカーの終値パネル
+
+        Returns:
+            self
+        """
+        if self.last_date is not None:
+            close = close.loc[close.index > self.last_date]
+        if close.empty:
+            return self
+
+        self._extend(pd.Index(close.columns))
+        values = close.reindex(columns=self.tickers).to_numpy(dtype=float)
+        alphas = {w: 2.0 / (w + 1) for w in MA_WINDOWS}
+
+        # EMAとRSIは前の値に依存するため日付順に更新する（銘柄方向はベクトル演算）
+        for row in values:
+            valid = ~np.isnan(row)
+            x = np.where(valid, row, 0.0)
+            first = valid & (self.bar_count == 0)
+            for w, alpha in alphas.items():
+                ema = self.ema[w]
+                self.ema[w] = np.where(first, x, np.where(valid, alpha * x + (1 - alpha) * ema, ema))
+
+            # RSIはWilderの平滑化（最初のRSI_PERIOD本は単純平均）
+            diff = np.where(valid & (self.bar_count > 0), x - self.last_close, np.nan)
+            has_diff = ~np.isnan(diff)
+            gain = np.where(has_diff, np.maximum(diff, 0.0), 0.0)
+            loss = np.where(has_diff, np.maximum(-diff, 0.0), 0.0)
+            warmup = has_diff & (self.bar_count <= RSI_PERIOD)
+            smooth = has_diff & (self.bar_count > RSI_PERIOD)
+            self.avg_gain = np.where(warmup, self.avg_gain + gain / RSI_PERIOD, self.avg_gain)
+            self.avg_loss = np.where(warmup, self.avg_loss + loss / RSI_PERIOD, self.avg_loss)
+            self.avg_gain = np.where(
+                smooth, (self.avg_gain * (RSI_PERIOD - 1) + gain) / RSI_PERIOD, self.avg_gain)
+            self.avg_loss = np.where(
+                smooth, (self.avg_loss * (RSI_PERIOD - 1) + loss) / RSI_PERIOD, self.avg_loss)
+
+            self.last_close = np.where(valid, x, self.last_close)
+            self.bar_count += valid
+
+        # 窓内の指標用に直近の終値を下詰めで保持する
+        window = _align_bottom(np.vstack([self.window, values]))
+        self.window = window[-WINDOW_BARS:]
+        self.last_date = close.index[-1]
+        return self
+
+    def results(self) -> pd.DataFrame:
+        """
+        現在の指標を計算する
+
+        Returns:
+            ティッカーをインデックスとし、INDICATOR_COLUMNSの列を持つDataFrame
+            （本数が足りない指標はNaN）
+        """
+        window = self.window
+        available = (~np.isnan(window)).sum(axis=0)
+        result = {}
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for w in MA_WINDOWS:
+                sma = window[-w:].mean(axis=0) if len(window) >= w else np.full(len(self.tickers), np.nan)
+                result[f'sma_{w}'] = np.where(available >= w, sma, np.nan)
+            for w in MA_WINDOWS:
+                result[f'ema_{w}'] = np.where(self.bar_count >= w, self.ema[w], np.nan)
+
+            # 直近1年（TRADING_DAYS本）の日次対数リターンの標準偏差を年率換算
+            year = window[-(TRADING_DAYS + 1):]
+            returns = np.diff(np.log(year), axis=0)
+            n_returns = (~np.isnan(returns)).sum(axis=0)
+            mean = np.nansum(returns, axis=0) / n_returns
+            variance = np.nansum((returns - mean) ** 2, axis=0) / (n_returns - 1)
+            result['volatility_pct'] = np.where(
+                n_returns >= 2, np.sqrt(variance * TRADING_DAYS) * 100, np.nan)
+
+            # 直近1年の高値からの最大下落率
+            year = year[1:] if len(year) > TRADING_DAYS else year
+            running_max = np.fmax.accumulate(year, axis=0)
+            drawdown = np.min(np.where(np.isnan(year), np.inf, year / running_max - 1), axis=0) \
+                if len(year) else np.full(len(self.tickers), np.inf)
+            result['max_drawdown_pct'] = np.where(np.isfinite(drawdown), drawdown * 100, np.nan)
+
+            rsi = 100 - 100 / (1 + self.avg_gain / self.avg_loss)
+            rsi = np.where(self.avg_loss == 0, 100.0, rsi)
+            result[f'rsi_{RSI_PERIOD}'] = np.where(self.bar_count > RSI_PERIOD, rsi, np.nan)
+
+            high = np.max(np.where(np.isnan(year), -np.inf, year), axis=0) \
+                if len(year) else np.full(len(self.tickers), -np.inf)
+            result['from_52w_high_pct'] = np.where(
+                np.isfinite(high), (self.last_close / high - 1) * 100, np.nan)
+
+        return pd.DataFrame(result, index=self.tickers, columns=INDICATOR_COLUMNS)
+
+
+def compute_indicators(close: pd.DataFrame, state: Optional[IndicatorState] = None) -> pd.DataFrame:
+    """
+    全銘柄のテクニカル指標を一括計算する
+
+    Args:
+        close: 日付 × ティッカーの終値パネル（build_close_panel()の結果）
+        state: 前回までの計算状態（省略時は全期間から計算する）
+
+    Returns:
+        ティッカーをインデックスとし、INDICATOR_COLUMNSの列を持つDataFrame
+    """
+    state = state if state is not None else IndicatorState()
+    if close.empty:
+        return pd.DataFrame(columns=INDICATOR_COLUMNS, dtype=float)
+    return state.update(close).results().reindex(close.columns)
+
+
+def to_indicator_dicts(indicators: pd.DataFrame) -> Dict[str, Dict[str, float]]:
+    """
+    compute_indicators()の結果をティッカー -> {指標名: 値} の辞書に変換する（NaNの指標は含めない）
+    """
+    records = {}
+    for ticker, row in indicators.to_dict(orient='index').items():
+        records[ticker] = {name: value for name, value in row.items() if not np.isnan(value)}
+    return records
+
@@ -0,0 +1,220 @@
+"""
+日中監視モジュール
+ウォッチリストの最新価格を一定間隔で取得し、しきい値を超えた銘柄をアラートとして通知します
+
+価格の履歴はリングバッファに保持し、ティックごとに過去データを取得し直すことはありません。
+ルールの判定は全銘柄をまとめたNumPy配列で行い、計算量は1ティック・1銘柄あたりO(1)です。
+"""
+import json
+import os
+import time
+import urllib.request
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RingBuffer:
+    """全銘柄の直近N件の価格を保持する固定長のリングバッファ"""
+
+    def __init__(self, capacity: int, width: int):
+        """
+        Args:
+            capacity: 保持するティック数
+            width: 銘柄数
+        """
+        self.capacity = max(1, int(capacity))
+        self._data = np.full((self.capacity, width), np.nan)
+        self._head = 0
+        self.count = 0
+
+    def push(self, values: np.ndarray) -> None:
+        """1ティック分の価格を追加する（最も古いものを上書き）"""
+        self._data[self._head] = values
+        self._head = (self._head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def latest(self) -> np.ndarray:
+        """最新のティック"""
+        return self._data[(self._head - 1) % self.capacity]
+
+    def oldest(self) -> np.ndarray:
+        """保持している中で最も古いティック"""
+        if self.count < self.capacity:
+            return self._data[0]
+        return self._data[self._head]
+
+
+class FileAlertSink:
+    """アラートをJSON Lines形式でファイルに追記する"""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def send(self, alerts: List[Dict]) -> None:
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for alert in alerts:
+                f.write(json.dumps(alert, ensure_ascii=False) + "\n")
+
+
+class WebhookAlertSink:
+    """アラートをJSONでWebhookにPOSTする"""
+
+    def __init__(self, url: str, timeout: float = 5.0):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, alerts: List[Dict]) -> None:
+        body = json.dumps({'alerts': alerts}, ensure_ascii=False).encode('utf-8')
+        request = urllib.request.Request(
+            self.url, data=body, headers={'Content-Type': 'application/json'}
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout):
+                pass
+        except Exception as e:
+            logger.error(f"Webhookへのアラート送信に失敗しました: {str(e)}")
+
+
+class IntradayMonitor:
+    """ウォッチリストの日中価格を監視するクラス"""
+
+    def __init__(self, tickers: List[str], fetch_prices: Callable[[List[str]], Dict[str, float]],
+                 sink, load_reference: Optional[Callable[[List[str]], List[Dict]]] = None,
+                 window_ticks: int = 15, move_pct: Optional[float] = 3.0,
+                 window_move_pct: Optional[float] = 2.0, week52_breach: bool = True):
+        """
+        Args:
+            tickers: 監視するティッカーシンボルのリスト
+            fetch_prices: ティッカーのリストを受け取り最新価格の辞書を返す関数
+            sink: send(alerts) メソッドを持つ通知先
+            load_reference: ティッカーのリストを受け取り、set_reference()に渡すデータを返す関数
+                （監視開始時と日付が変わったときに呼び出す）
+            window_ticks: 短期変動を判定するリングバッファのティック数
+            move_pct: 前日終値からの変動率のしきい値（%、Noneで無効）
+            window_move_pct: 直近window_ticksでの変動率のしきい値（%、Noneで無効）
+            week52_breach: 52週高値・安値の更新をアラートにするか
+        """
+        self.tickers = list(dict.fromkeys(tickers))
+        self.fetch_prices = fetch_prices
+        self.load_reference = load_reference
+        self.sink = sink
+        self.move_pct = move_pct
+        self.window_move_pct = window_move_pct
+        self.week52_breach = week52_breach
+
+        width = len(self.tickers)
+        self.buffer = RingBuffer(window_ticks, width)
+        self.prev_close = np.full(width, np.nan)
+        self.week52_high = np.full(width, np.nan)
+        self.week52_low = np.full(width, np.nan)
+        # ルールごとの発火状態（条件を満たし始めたときだけ通知する）
+        self._active = {}
+        self._reference_date = None
+
+    def set_reference(self, stocks_data: List[Dict]) -> None:
+        """
+        前日終値・52週高値/安値を設定する
+
+        Args:
+            stocks_data: StockDataFetcher.get_multiple_stocks()の結果
+        """
+        positions = {ticker: i for i, ticker in enumerate(self.tickers)}
+        today = datetime.now().date()
+        for stock_data in stocks_data:
+            i = positions.get(stock_data.get('ticker'))
+            if i is None or 'error' in stock_data:
+                continue
+
+            yearly_data = stock_data.get('yearly_data')
+            if yearly_data is not None and not yearly_data.empty:
+                # 当日のバーがあれば除いた最後の終値を前日終値とする
+                closes = yearly_data['Close']
+                before_today = closes[[d.date() < today for d in closes.index]]
+                if not before_today.empty:
+                    self.prev_close[i] = before_today.iloc[-1]
+
+            for key, target in (('52_week_high', self.week52_high), ('52_week_low', self.week52_low)):
+                if stock_data.get(key) is not None:
+                    target[i] = stock_data[key]
+
+    def tick(self, prices: Dict[str, float]) -> List[Dict]:
+        """
+        1ティック分の価格でルールを判定する
+
+        Args:
+            prices: ティッカー -> 最新価格
+
+        Returns:
+            新たに発生したアラートのリスト
+        """
+        values = np.array([prices.get(ticker, np.nan) for ticker in self.tickers], dtype=float)
+        if self.buffer.count:
+            # 取得できなかった銘柄は直前の価格を引き継ぐ
+            values = np.where(np.isnan(values), self.buffer.latest(), values)
+        self.buffer.push(values)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            checks = {}
+            if self.move_pct is not None:
+                change = (values / self.prev_close - 1) * 100
+                checks['move_pct'] = (np.abs(change) >= self.move_pct, change)
+            if self.window_move_pct is not None and self.buffer.count > 1:
+                change = (values / self.buffer.oldest() - 1) * 100
+                checks['window_move_pct'] = (np.abs(change) >= self.window_move_pct, change)
+            if self.week52_breach:
+                checks['52_week_high'] = (values > self.week52_high, self.week52_high)
+                checks['52_week_low'] = (values < self.week52_low, self.week52_low)
+
+        timestamp = datetime.now().isoformat()
+        alerts = []
+        for rule, (triggered, reference) in checks.items():
+            active = self._active.get(rule, np.zeros(len(self.tickers), dtype=bool))
+            for i in np.flatnonzero(triggered & ~active):
+                alerts.append({
+                    'time': timestamp,
+                    'ticker': self.tickers[i],
+                    'rule': rule,
+                    'price': float(values[i]),
+                    'value': float(reference[i]),
+                })
+            self._active[rule] = triggered
+
+        if alerts:
+            self.sink.send(alerts)
+            logger.info(f"{len(alerts)}件のアラートを送信しました")
+        return alerts
+
+    def run(self, interval_seconds: float = 60, max_ticks: Optional[int] = None) -> None:
+        """
+        一定間隔で価格を取得してルールを判定し続ける
+
+        Args:
+            interval_seconds: 取得間隔（秒）
+            max_ticks: 実行するティック数の上限（Noneで停止されるまで）
+        """
+        ticks = 0
+        while max_ticks is None or ticks < max_ticks:
+            started = time.monotonic()
+            try:
+                # 日付が変わったら前日終値などを更新する
+                today = datetime.now().date()
+                if self.load_reference is not None and self._reference_date != today:
+                    self.set_reference(self.load_reference(self.tickers))
+                    self._reference_date = today
+                    self._active.clear()
+
+                self.tick(self.fetch_prices(self.tickers))
+            except Exception as e:
+                logger.error(f"価格の取得中にエラーが発生しました: {str(e)}")
+            ticks += 1
+
+            elapsed = time.monotonic() - started
+            if elapsed > interval_seconds:
+                logger.warning(f"1ティックの処理に{elapsed:.1f}秒かかり、取得間隔を超えました")
+            elif max_ticks is None or ticks < max_ticks:
+                time.sleep(interval_seconds - elapsed)
@@ -1,14 +1,15 @@
 """
 株価監視システム - メインスクリプト
 週次レポートを自動生成します
+
+yfinance / pandas / matplotlib / jinja2 などの重いモジュールは
+レポートを実際に生成するときに読み込みます（スケジューラーの起動を軽くするため）。
 """
-import yaml
+import os
 import schedule
 import time
 import logging
-from datetime import datetime
-from stock_data_fetcher import StockDataFetcher
-from report_generator import ReportGenerator
+from report_runner import ReportRunner, create_fetcher, load_config
 
 logging.basicConfig(
     level=logging.INFO,
@@ -17,124 +18,224 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def load_config(config_path: str = "config.yaml") -> dict:
-    """設定ファイルを読み込む"""
+def generate_weekly_report():
+    """週次レポートを生成する関数（1回限りの実行用）"""
+    runner = ReportRunner()
     try:
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config = yaml.safe_load(f)
-        return config
-    except FileNotFoundError:
-        logger.error(f"設定ファイルが見つかりません: {config_path}")
-        raise
-    except yaml.YAMLError as e:
-        logger.error(f"設定ファイルの読み込みエラー: {e}")
-        raise
+        runner.run()
+    finally:
+        runner.close()
 
 
-def generate_weekly_report():
-    """週次レポートを生成する関数"""
-    logger.info("週次レポートの生成を開始します...")
+def run_shard(shard: tuple):
+    """
+    ウォッチリストの1シャード分を処理し、中間ファイルを書き出す
     
+    Args:
+        shard: (シャード番号, シャード数)。shard.parse_shard()で "i/N" 形式から変換したもの
+    """
+    runner = ReportRunner()
     try:
-        # 設定を読み込む
-        config = load_config()
-        watchlist = config.get('watchlist', [])
-        report_config = config.get('report', {})
-        output_dir = report_config.get('output_dir', './reports')
-        
-        if not watchlist:
-            logger.warning("ウォッチリストが空です。設定ファイルを確認してください。")
-            return
-        
-        # 株価データを取得
-        fetcher = StockDataFetcher()
-        logger.info(f"{len(watchlist)}件の株価データを取得中...")
-        stocks_data = fetcher.get_multiple_stocks(watchlist)
-        
-        # 価格変動を計算
-        price_changes = []
-        for stock_data in stocks_data:
-            if 'error' not in stock_data:
-                changes = fetcher.calculate_price_change(stock_data)
-                price_changes.append(changes)
-            else:
-                price_changes.append({})
-        
-        # レポートを生成
-        generator = ReportGenerator(output_dir=output_dir)
-        report_format = report_config.get('format', 'html')
-        
-        if report_format == 'html':
-            report_path = generator.generate_html_report(stocks_data, price_changes)
-            logger.info(f"レポートが生成されました: {report_path}")
-        else:
-            logger.warning(f"未対応のレポート形式です: {report_format}")
-        
-        # サマリーをログに出力
-        logger.info("=" * 60)
-        logger.info("レポートサマリー")
-        logger.info("=" * 60)
-        for stock_data, changes in zip(stocks_data, price_changes):
-            if 'error' not in stock_data:
-                ticker = stock_data['ticker']
-                company_name = stock_data.get('company_name', 'N/A')
-                current_price = stock_data.get('current_price', 'N/A')
-                
-                week_change = changes.get('week_change', {})
-                week_pct = week_change.get('percentage', None)
-                
-                logger.info(f"{ticker} ({company_name}): {current_price}")
-                if week_pct is not None:
-                    logger.info(f"  1週間変動: {week_pct:+.2f}%")
-        logger.info("=" * 60)
-        
-    except Exception as e:
-        logger.error(f"レポート生成中にエラーが発生しました: {str(e)}", exc_info=True)
+        runner.run(shard=shard)
+    finally:
+        runner.close()
+
+
+def backfill_reports(weeks: int):
+    """
+    過去の週次レポートを再生成する
+    
+    Args:
+        weeks: 再生成する週数
+    """
+    runner = ReportRunner()
+    try:
+        runner.backfill(weeks)
+    finally:
+        runner.close()
+
+
+def merge_shards(directory: str = None):
+    """
+    シャードの中間ファイルを結合して最終レポートを生成する
+    
+    Args:
+        directory: 中間ファイルのディレクトリ（省略時は今日の分）
+    """
+    runner = ReportRunner()
+    try:
+        runner.merge(directory)
+    finally:
+        runner.close()
+
+
+# 曜日の指定（dailyは毎日）
+SCHEDULE_DAYS = (
+    'daily', 'monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday'
+)
+
+
+def get_schedule_jobs(schedule_config: dict) -> list:
+    """
+    scheduleセクションから実行スケジュールのリストを作成する
+    
+    day_of_week/time の指定に加えて、jobs に複数のスケジュールを指定できます。
+    
+    Returns:
+        (曜日, 時刻) のタプルのリスト
+    """
+    jobs = []
+    if 'jobs' not in schedule_config or 'day_of_week' in schedule_config:
+        jobs.append((
+            schedule_config.get('day_of_week', 'monday'),
+            schedule_config.get('time', '09:00')
+        ))
+    for job in schedule_config.get('jobs') or []:
+        jobs.append((job.get('day_of_week', 'daily'), job.get('time', '09:00')))
+    return jobs
 
 
 def run_scheduler():
-    """スケジューラーを実行"""
-    config = load_config()
-    schedule_config = config.get('schedule', {})
+    """
+    スケジューラーを実行
     
-    day_of_week = schedule_config.get('day_of_week', 'monday')
-    time_str = schedule_config.get('time', '09:00')
+    レポート生成に使うオブジェクトやキャッシュは常駐プロセス内で保持し、
+    次の実行予定時刻までスリープします。
+    """
+    config = load_config()
+    schedule_config = config.get('schedule', {}) or {}
+    runner = ReportRunner()
     
     # スケジュールを設定
-    if day_of_week == 'monday':
-        schedule.every().monday.at(time_str).do(generate_weekly_report)
-    elif day_of_week == 'tuesday':
-        schedule.every().tuesday.at(time_str).do(generate_weekly_report)
-    elif day_of_week == 'wednesday':
-        schedule.every().wednesday.at(time_str).do(generate_weekly_report)
-    elif day_of_week == 'thursday':
-        schedule.every().thursday.at(time_str).do(generate_weekly_report)
-    elif day_of_week == 'friday':
-        schedule.every().friday.at(time_str).do(generate_weekly_report)
-    elif day_of_week == 'saturday':
-        schedule.every().saturday.at(time_str).do(generate_weekly_report)
-    elif day_of_week == 'sunday':
-        schedule.every().sunday.at(time_str).do(generate_weekly_report)
-    
-    logger.info(f"スケジューラーを設定しました: 毎週{day_of_week}の{time_str}にレポートを生成します")
+    for day_of_week, time_str in get_schedule_jobs(schedule_config):
+        if day_of_week not in SCHEDULE_DAYS:
+            logger.warning(f"未対応の曜日指定です: {day_of_week}")
+            continue
+        
+        if day_of_week == 'daily':
+            schedule.every().day.at(time_str).do(runner.run)
+            logger.info(f"スケジューラーを設定しました: 毎日{time_str}にレポートを生成します")
+        else:
+            getattr(schedule.every(), day_of_week).at(time_str).do(runner.run)
+            logger.info(f"スケジューラーを設定しました: 毎週{day_of_week}の{time_str}にレポートを生成します")
+    
+    if not schedule.get_jobs():
+        logger.error("有効なスケジュールがありません。設定ファイルを確認してください。")
+        return
+    
     logger.info("スケジューラーを開始します... (Ctrl+Cで停止)")
     
-    # スケジューラーを実行
+    # 次の実行予定時刻までスリープしてから実行する
     try:
         while True:
+            idle_seconds = schedule.idle_seconds()
+            if idle_seconds > 0:
+                logger.info(f"次の実行予定: {schedule.next_run()}")
+                time.sleep(idle_seconds)
             schedule.run_pending()
-            time.sleep(60)  # 1分ごとにチェック
     except KeyboardInterrupt:
         logger.info("スケジューラーを停止しました")
+    finally:
+        runner.close()
+
+
+def run_monitor():
+    """日中監視モードを実行"""
+    from intraday_monitor import FileAlertSink, IntradayMonitor, WebhookAlertSink
+    
+    config = load_config()
+    watchlist = config.get('watchlist', [])
+    monitor_config = config.get('monitor', {}) or {}
+    rules = monitor_config.get('rules', {}) or {}
+    sink_config = monitor_config.get('sink', {}) or {}
+    
+    if not watchlist:
+        logger.warning("ウォッチリストが空です。設定ファイルを確認してください。")
+        return
+    
+    if sink_config.get('type', 'file') == 'webhook':
+        sink = WebhookAlertSink(sink_config['url'])
+    else:
+        output_dir = config.get('report', {}).get('output_dir', './reports')
+        sink = FileAlertSink(sink_config.get('path') or os.path.join(output_dir, 'alerts.jsonl'))
+    
+    fetcher = create_fetcher(config)
+    monitor = IntradayMonitor(
+        watchlist,
+        fetch_prices=lambda tickers: fetcher.get_latest_prices(
+            tickers, interval=monitor_config.get('bar_interval', '1m')
+        ),
+        sink=sink,
+        load_reference=fetcher.get_multiple_stocks,
+        window_ticks=monitor_config.get('window_ticks', 15),
+        move_pct=rules.get('move_pct', 3.0),
+        window_move_pct=rules.get('window_move_pct', 2.0),
+        week52_breach=rules.get('week52_breach', True)
+    )
+    
+    interval = monitor_config.get('interval_seconds', 60)
+    logger.info(f"日中監視を開始します: {len(watchlist)}銘柄、{interval}秒間隔 (Ctrl+Cで停止)")
+    try:
+        monitor.run(interval_seconds=interval)
+    except KeyboardInterrupt:
+        logger.info("日中監視を停止しました")
+    finally:
+        fetcher.close()
+
+
+USAGE = """使用方法:
+  python main.py                   スケジューラーを実行
+  python main.py --now             即座にレポートを生成
+  python main.py --shard i/N       ウォッチリストの1シャード分だけを処理（iは0始まり）
+  python main.py --merge [DIR]     シャードの中間ファイルを結合してレポートを生成
+  python main.py --backfill WEEKS  過去WEEKS週分の週次レポートを再生成
+  python main.py --monitor         日中監視モード"""
+
+
+def exit_with_usage(message: str):
+    """引数の誤りを使用方法とともに表示して終了する"""
+    import sys
+    
+    print(f"エラー: {message}", file=sys.stderr)
+    print(USAGE, file=sys.stderr)
+    sys.exit(2)
 
 
 if __name__ == "__main__":
     import sys
     
-    # コマンドライン引数で動作を切り替え
-    if len(sys.argv) > 1 and sys.argv[1] == "--now":
+    # コマンドライン引数で動作を切り替え（引数の誤りでスケジューラーを起動しないよう、先に動作を決める）
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    argument = sys.argv[2] if len(sys.argv) > 2 else None
+    
+    if command is None:
+        # スケジューラーを実行
+        run_scheduler()
+    elif command == "--now":
         # 即座にレポートを生成
         generate_weekly_report()
+    elif command == "--shard":
+        # ウォッチリストの1シャード分だけを処理（例: --shard 0/4）
+        from shard import parse_shard
+        if argument is None:
+            exit_with_usage("--shard にはシャードを i/N の形式で指定してください")
+        try:
+            shard = parse_shard(argument)
+        except ValueError as e:
+            exit_with_usage(str(e))
+        run_shard(shard)
+    elif command == "--merge":
+        # シャードの中間ファイルを結合してレポートを生成
+        merge_shards(argument)
+    elif command == "--backfill":
+        # 過去の週次レポートを再生成（例: --backfill 12）
+        if argument is None or not argument.isdecimal() or int(argument) < 1:
+            exit_with_usage("--backfill には再生成する週数を1以上の整数で指定してください")
+        backfill_reports(int(argument))
+    elif command == "--monitor":
+        # 日中監視モード
+        run_monitor()
+    elif command in ("-h", "--help"):
+        print(USAGE)
     else:
-        # スケジューラーを実行
-        run_scheduler()
+        exit_with_usage(f"未対応の引数です: {command}")
@@ -0,0 +1,105 @@
+"""
+会社情報キャッシュモジュール
+Ticker.info の項目を項目ごとの有効期限付きで保存します
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class MetadataCache:
+    """項目ごとのTTLとLRU削除を持つ会社情報キャッシュ（JSONファイルに永続化）"""
+
+    def __init__(self, path: str, default_ttl_hours: float = 24,
+                 field_ttl_hours: Optional[Dict[str, float]] = None,
+                 max_entries: int = 10000):
+        """
+        Args:
+            path: 保存先のJSONファイルのパス
+            default_ttl_hours: 個別指定のない項目の有効期限（時間）
+            field_ttl_hours: 項目名 -> 有効期限（時間）の辞書
+            max_entries: 保持するティッカー数の上限（超えた分は古いものから削除）
+        """
+        self.path = path
+        self.default_ttl = default_ttl_hours * 3600
+        self.field_ttl = {field: hours * 3600 for field, hours in (field_ttl_hours or {}).items()}
+        self.max_entries = max_entries
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._load()
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._entries = OrderedDict(json.load(f))
+        except (OSError, ValueError) as e:
+            logger.warning(f"会社情報キャッシュを読み込めませんでした: {e}")
+
+    def get(self, ticker: str, fields: Iterable[str]) -> Optional[Dict]:
+        """
+        キャッシュ済みの会社情報を取得する
+
+        Args:
+            ticker: ティッカーシンボル
+            fields: 必要な項目名
+
+        Returns:
+            すべての項目が有効期限内であれば項目名 -> 値の辞書、そうでなければNone
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(ticker)
+            if entry is None:
+                return None
+
+            values = {}
+            for field in fields:
+                cached = entry.get(field)
+                if cached is None or now - cached[1] >= self.field_ttl.get(field, self.default_ttl):
+                    return None
+                values[field] = cached[0]
+
+            self._entries.move_to_end(ticker)
+            return values
+
+    def put(self, ticker: str, info: Dict, fields: Iterable[str]) -> None:
+        """
+        Ticker.info の必要な項目を保存する（infoに無い項目もNoneとして保存）
+
+        Args:
+            ticker: ティッカーシンボル
+            info: Ticker.info の辞書
+            fields: 保存する項目名
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.setdefault(ticker, {})
+            for field in fields:
+                entry[field] = [info.get(field), now]
+            self._entries.move_to_end(ticker)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+
+    def save(self) -> None:
+        """変更があればJSONファイルに書き出す"""
+        with self._lock:
+            if not self._dirty:
+                return
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
@@ -0,0 +1,220 @@
+"""
+実行メトリクスモジュール
+レポート生成の処理段階ごとの所要時間、銘柄ごとの取得時間、リトライ・エラーの件数を記録し、
+Prometheusのテキスト形式とJSONのサマリーとして書き出します
+
+無効（enabled=False）の場合、記録用のメソッドは何もせずに戻ります。
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+# 取得時間ヒストグラムのバケット（秒）
+FETCH_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# JSONサマリーに載せる取得の遅い銘柄の件数
+SLOWEST_TICKERS = 10
+
+PROMETHEUS_PREFIX = "stock_report"
+
+
+class TimedFile:
+    """write()にかかった時間を合計するファイルのラッパー"""
+
+    def __init__(self, f):
+        self._f = f
+        self.seconds = 0.0
+
+    def write(self, data: str) -> int:
+        start = time.perf_counter()
+        try:
+            return self._f.write(data)
+        finally:
+            self.seconds += time.perf_counter() - start
+
+
+class RunMetrics:
+    """1回のレポート生成のメトリクスを記録するクラス（複数スレッドから記録できる）"""
+
+    def __init__(self, enabled: bool = True, buckets: Tuple[float, ...] = FETCH_BUCKETS):
+        """
+        Args:
+            enabled: 記録するか（Falseの場合は何も記録しない）
+            buckets: 取得時間ヒストグラムのバケットの上限（秒）
+        """
+        self.enabled = enabled
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """記録を消去する（実行ごとに呼び出す）"""
+        self.started_at = datetime.now()
+        self.stages = {}
+        self.counters = {}
+        self.fetch_seconds = {}
+        self.failed_tickers = {}
+
+    @contextmanager
+    def _timed(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(name, time.perf_counter() - start)
+
+    def stage(self, name: str):
+        """
+        with文の中の処理時間を処理段階nameの時間として加算する
+
+        Args:
+            name: 処理段階の名前（fetch, charts など）
+        """
+        if not self.enabled:
+            return nullcontext()
+        return self._timed(name)
+
+    def add_stage(self, name: str, seconds: float) -> None:
+        """計測済みの時間を処理段階nameの時間として加算する"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def count(self, name: str, amount: int = 1) -> None:
+        """
+        カウンターを加算する
+
+        Args:
+            name: カウンター名（retries, fetch_errors など）
+            amount: 加算する数
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe_fetch(self, ticker: str, seconds: float, ok: bool = True) -> None:
+        """
+        1銘柄の取得時間を記録する
+
+        Args:
+            ticker: ティッカーシンボル
+            seconds: 取得にかかった時間（レート制限の待ち時間を含む）
+            ok: 取得に成功したか（再取得で成功した場合は失敗したティッカーから除く）
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self.fetch_seconds[ticker] = seconds
+            if ok:
+                self.failed_tickers.pop(ticker, None)
+            else:
+                self.failed_tickers[ticker] = True
+                self.counters['fetch_errors'] = self.counters.get('fetch_errors', 0) + 1
+
+    def histogram(self) -> List[Tuple[float, int]]:
+        """取得時間の累積ヒストグラム（バケットの上限, 件数）のリスト（最後は+Inf）"""
+        values = list(self.fetch_seconds.values())
+        cumulative = [(bound, sum(1 for v in values if v <= bound)) for bound in self.buckets]
+        cumulative.append((float('inf'), len(values)))
+        return cumulative
+
+    def summary(self, report_path: Optional[str] = None) -> Dict:
+        """JSONサマリーの内容を作成する"""
+        values = sorted(self.fetch_seconds.values())
+        slowest = sorted(self.fetch_seconds.items(), key=lambda item: item[1], reverse=True)
+
+        def percentile(q: float) -> Optional[float]:
+            if not values:
+                return None
+            return round(values[min(len(values) - 1, int(q * len(values)))], 4)
+
+        return {
+            'started_at': self.started_at.isoformat(),
+            'finished_at': datetime.now().isoformat(),
+            'report_path': report_path,
+            'stages': {name: round(seconds, 4) for name, seconds in self.stages.items()},
+            'fetch': {
+                'count': len(values),
+                'errors': len(self.failed_tickers),
+                'p50_seconds': percentile(0.5),
+                'p90_seconds': percentile(0.9),
+                'p99_seconds': percentile(0.99),
+                'max_seconds': round(values[-1], 4) if values else None,
+                'slowest': [{'ticker': ticker, 'seconds': round(seconds, 4)}
+                            for ticker, seconds in slowest[:SLOWEST_TICKERS]],
+                'failed_tickers': list(self.failed_tickers),
+            },
+            'counters': dict(self.counters),
+        }
+
+    def to_prometheus(self) -> str:
+        """Prometheusのテキスト形式（node_exporterのtextfile collector向け）に変換する"""
+        p = PROMETHEUS_PREFIX
+        lines = [
+            f"# HELP {p}_stage_seconds 処理段階ごとの所要時間（秒）",
+            f"# TYPE {p}_stage_seconds gauge",
+        ]
+        for name, seconds in self.stages.items():
+            lines.append(f'{p}_stage_seconds{{stage="{name}"}} {seconds:.6f}')
+
+        lines += [
+            f"# HELP {p}_fetch_seconds 銘柄ごとの取得時間（秒）",
+            f"# TYPE {p}_fetch_seconds histogram",
+        ]
+        for bound, count in self.histogram():
+            le = "+Inf" if bound == float('inf') else f"{bound:g}"
+            lines.append(f'{p}_fetch_seconds_bucket{{le="{le}"}} {count}')
+        lines.append(f"{p}_fetch_seconds_sum {sum(self.fetch_seconds.values()):.6f}")
+        lines.append(f"{p}_fetch_seconds_count {len(self.fetch_seconds)}")
+
+        # retriesとfetch_errorsは発生していなくても0として出力する
+        counters = {'retries': 0, 'fetch_errors': 0, **self.counters}
+        for name, value in counters.items():
+            lines += [f"# TYPE {p}_{name}_total counter", f"{p}_{name}_total {value}"]
+
+        lines += [
+            f"# TYPE {p}_last_run_timestamp_seconds gauge",
+            f"{p}_last_run_timestamp_seconds {time.time():.0f}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def write(self, report_path: Optional[str], output_dir: str) -> Optional[Tuple[str, str]]:
+        """
+        レポートと同じ場所にPrometheusのテキストファイルとJSONサマリーを書き出す
+
+        Args:
+            report_path: 生成したレポートのパス（生成できなかった場合はNone）
+            output_dir: report_pathが無い場合の出力先
+
+        Returns:
+            (.promファイルのパス, JSONサマリーのパス)。無効の場合はNone
+        """
+        if not self.enabled:
+            return None
+
+        if report_path is not None:
+            base = os.path.splitext(report_path)[0]
+        else:
+            base = os.path.join(output_dir, f"stock_report_{self.started_at.strftime('%Y%m%d_%H%M%S')}")
+        prom_path = f"{base}.prom"
+        json_path = f"{base}_metrics.json"
+
+        # 収集側が書きかけのファイルを読まないよう、一時ファイルから置き換える
+        for path, content in ((prom_path, self.to_prometheus()),
+                              (json_path, json.dumps(self.summary(report_path),
+                                                     ensure_ascii=False, indent=2))):
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        return prom_path, json_path
+
+
+# 計測しない場合に使うメトリクス
+NULL_METRICS = RunMetrics(enabled=False)
@@ -0,0 +1,157 @@
+"""
+価格履歴キャッシュモジュール
+ティッカーごとの日足データをSQLiteに保存し、差分取得に利用します
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+import pandas as pd
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 保存する列（stock.history()の列名）
+BAR_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume', 'Dividends', 'Stock Splits']
+
+
+def period_start(last_date: pd.Timestamp, period: str) -> Optional[pd.Timestamp]:
+    """
+    yfinanceのperiod文字列（1mo, 1y, ytd など）を開始日に変換する
+
+    Args:
+        last_date: 期間の終端となる日付
+        period: yfinanceのperiod文字列
+
+    Returns:
+        期間の開始日（maxの場合はNone）
+    """
+    if period == 'max':
+        return None
+    if period == 'ytd':
+        return last_date.normalize().replace(month=1, day=1)
+
+    units = {'d': 'days', 'mo': 'months', 'y': 'years'}
+    for suffix, unit in units.items():
+        if period.endswith(suffix) and period[:-len(suffix)].isdigit():
+            return last_date - pd.DateOffset(**{unit: int(period[:-len(suffix)])})
+    raise ValueError(f"未対応の期間指定です: {period}")
+
+
+class PriceCache:
+    """日足データの永続キャッシュ（SQLite）"""
+
+    def __init__(self, path: str, max_age_minutes: float = 60):
+        """
+        Args:
+            path: SQLiteファイルのパス
+            max_age_minutes: 最終同期からこの時間内であれば再取得しない
+        """
+        self.path = path
+        self.max_age_seconds = max_age_minutes * 60
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS bars (
+                ticker TEXT NOT NULL,
+                date TEXT NOT NULL,
+                open REAL, high REAL, low REAL, close REAL,
+                volume REAL, dividends REAL, splits REAL,
+                PRIMARY KEY (ticker, date)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS sync (
+                ticker TEXT PRIMARY KEY,
+                tz TEXT,
+                synced_at REAL NOT NULL
+            );
+        """)
+        self._conn.commit()
+
+    def load(self, ticker: str) -> Optional[pd.DataFrame]:
+        """
+        保存済みの日足データを読み込む
+
+        Args:
+            ticker: ティッカーシンボル
+
+        Returns:
+            stock.history()と同じ列を持つDataFrame（未保存の場合はNone）
+        """
+        with self._lock:
+            sync = self._conn.execute(
+                "SELECT tz FROM sync WHERE ticker = ?", (ticker,)
+            ).fetchone()
+            if sync is None:
+                return None
+            rows = self._conn.execute(
+                "SELECT date, open, high, low, close, volume, dividends, splits "
+                "FROM bars WHERE ticker = ? ORDER BY date", (ticker,)
+            ).fetchall()
+
+        if not rows:
+            return None
+
+        frame = pd.DataFrame.from_records(rows, columns=['Date'] + BAR_COLUMNS)
+        index = pd.DatetimeIndex(pd.to_datetime(frame.pop('Date')), name='Date')
+        if sync[0]:
+            index = index.tz_localize(sync[0])
+        frame.index = index
+        return frame
+
+    def is_fresh(self, ticker: str) -> bool:
+        """最終同期からmax_age_minutes以内かどうか"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT synced_at FROM sync WHERE ticker = ?", (ticker,)
+            ).fetchone()
+        return row is not None and time.time() - row[0] < self.max_age_seconds
+
+    def store(self, ticker: str, history: pd.DataFrame, replace: bool = False,
+              keep_from: Optional[pd.Timestamp] = None) -> None:
+        """
+        日足データを保存する（同じ日付の行は上書き）
+
+        Args:
+            ticker: ティッカーシンボル
+            history: 保存する価格履歴
+            replace: Trueの場合は既存データを削除してから保存する
+            keep_from: この日付より前の行を削除する
+        """
+        tz = str(history.index.tz) if getattr(history.index, 'tz', None) is not None else None
+        frame = history.reindex(columns=BAR_COLUMNS)
+        dates = history.index.strftime('%Y-%m-%d')
+        rows = [
+            (ticker, date, *(None if pd.isna(v) else float(v) for v in values))
+            for date, values in zip(dates, frame.itertuples(index=False, name=None))
+        ]
+
+        with self._lock, self._conn:
+            if replace:
+                self._conn.execute("DELETE FROM bars WHERE ticker = ?", (ticker,))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO bars "
+                "(ticker, date, open, high, low, close, volume, dividends, splits) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            if keep_from is not None:
+                self._conn.execute(
+                    "DELETE FROM bars WHERE ticker = ? AND date < ?",
+                    (ticker, keep_from.strftime('%Y-%m-%d'))
+                )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sync (ticker, tz, synced_at) VALUES (?, ?, ?)",
+                (ticker, tz, time.time())
+            )
+
+    def invalidate(self, ticker: str) -> None:
+        """ティッカーのキャッシュを削除する"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM bars WHERE ticker = ?", (ticker,))
+            self._conn.execute("DELETE FROM sync WHERE ticker = ?", (ticker,))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
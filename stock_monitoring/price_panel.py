@@ -0,0 +1,145 @@
+"""
+価格パネル計算モジュール
+ウォッチリスト全体の終値を横持ち（日付 × ティッカー）のDataFrameにまとめ、
+価格変動をベクトル演算で一括計算します
+"""
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+# 期間名と、calculate_price_change() が返す辞書のキー
+CHANGE_PERIODS = {
+    'week': 'week_change',
+    'month': 'month_change',
+    'year': 'year_change',
+}
+
+
+def build_close_panel(stocks_data: List[Dict], column: str = 'Close') -> pd.DataFrame:
+    """
+    各銘柄のyearly_dataから終値パネルを作成する
+
+    取引所ごとにタイムゾーンが異なるため、インデックスは現地日付（タイムゾーンなし）に
+    揃えます。休場日は NaN になります。
+
+    Args:
+        stocks_data: get_multiple_stocks()で取得したデータのリスト
+        column: パネルにする列名
+
+    Returns:
+        日付 × ティッカーのDataFrame
+    """
+    series = {}
+    for stock_data in stocks_data:
+        if 'error' in stock_data:
+            continue
+        yearly_data = stock_data.get('yearly_data')
+        if yearly_data is None or yearly_data.empty:
+            continue
+        values = yearly_data[column]
+        if getattr(values.index, 'tz', None) is not None:
+            values = values.tz_localize(None)
+        series[stock_data['ticker']] = values
+
+    if not series:
+        return pd.DataFrame(dtype=float)
+    return pd.DataFrame(series).sort_index()
+
+
+def compute_price_changes(close: pd.DataFrame,
+                          current_prices: Optional[pd.Series] = None) -> pd.DataFrame:
+    """
+    全銘柄の1週間・1ヶ月・1年の価格変動を一括計算する
+
+    基準価格は StockDataFetcher.split_history() と同じ範囲の先頭値です
+    （1週間: 直近5営業日の先頭、1ヶ月: 最終日の1ヶ月前以降の先頭、1年: 全期間の先頭）。
+
+    Args:
+        close: 日付 × ティッカーの終値パネル
+        current_prices: ティッカー -> 現在価格（省略時は各銘柄の最終終値）
+
+    Returns:
+        ティッカーをインデックスとし、current_price と
+        {week,month,year}_{from,absolute,percentage} 列を持つDataFrame
+    """
+    if close.empty:
+        # 全銘柄の取得に失敗した場合など（行または列が無いとargmaxが使えない）
+        names = ['current_price'] + [f'{period}_{kind}' for period in CHANGE_PERIODS
+                                     for kind in ('from', 'absolute', 'percentage')]
+        return pd.DataFrame(np.nan, index=close.columns, columns=names)
+
+    values = close.to_numpy(dtype=float)
+    valid = ~np.isnan(values)
+    n_rows = values.shape[0]
+    columns = np.arange(values.shape[1])
+    has_data = valid.any(axis=0)
+
+    # 各銘柄の最終有効行
+    last_row = n_rows - 1 - np.argmax(valid[::-1], axis=0)
+
+    # 末尾から数えた有効行の番号（最終有効行が1）
+    count_from_end = np.cumsum(valid[::-1], axis=0)[::-1]
+    total_valid = count_from_end[0]
+
+    # 1週間: 直近5営業日の先頭行
+    week_mask = valid & (count_from_end == np.minimum(5, total_valid))
+    week_row = np.argmax(week_mask, axis=0)
+
+    # 1ヶ月: 最終日の1ヶ月前以降で最初の有効行
+    dates = close.index.to_numpy(dtype='datetime64[ns]')
+    month_start = (pd.DatetimeIndex(dates[last_row]) - pd.DateOffset(months=1)).to_numpy()
+    month_mask = valid & (dates[:, None] >= month_start[None, :])
+    month_row = np.argmax(month_mask, axis=0)
+
+    # 1年: 最初の有効行
+    year_row = np.argmax(valid, axis=0)
+
+    if current_prices is None:
+        current = values[last_row, columns]
+    else:
+        current = current_prices.reindex(close.columns).to_numpy(dtype=float)
+
+    result = {'current_price': current}
+    for period, rows in (('week', week_row), ('month', month_row), ('year', year_row)):
+        from_price = np.where(has_data, values[rows, columns], np.nan)
+        absolute = current - from_price
+        with np.errstate(divide='ignore', invalid='ignore'):
+            percentage = absolute / from_price * 100
+        result[f'{period}_from'] = from_price
+        result[f'{period}_absolute'] = absolute
+        result[f'{period}_percentage'] = percentage
+
+    return pd.DataFrame(result, index=close.columns)
+
+
+def to_change_dicts(changes: pd.DataFrame, stocks_data: List[Dict]) -> List[Dict]:
+    """
+    compute_price_changes()の結果をcalculate_price_change()と同じ形式の辞書のリストに変換する
+
+    Args:
+        changes: compute_price_changes()の結果
+        stocks_data: 並び順の基準となるデータのリスト
+
+    Returns:
+        stocks_dataと同じ順序の価格変動辞書のリスト（データが無い銘柄は空の辞書）
+    """
+    records = changes.to_dict(orient='index')
+    price_changes = []
+    for stock_data in stocks_data:
+        row = records.get(stock_data.get('ticker'))
+        if 'error' in stock_data or row is None or not row['current_price'] \
+                or np.isnan(row['current_price']):
+            price_changes.append({})
+            continue
+
+        entry = {}
+        for period, key in CHANGE_PERIODS.items():
+            if np.isnan(row[f'{period}_from']):
+                continue
+            entry[key] = {
+                'absolute': row[f'{period}_absolute'],
+                'percentage': row[f'{period}_percentage'],
+                'from_price': row[f'{period}_from'],
+            }
+        price_changes.append(entry)
+    return price_changes
@@ -0,0 +1,54 @@
+"""
+レート制限モジュール
+トークンバケット方式でAPI呼び出しの頻度を制限します
+"""
+import threading
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """スレッドセーフなトークンバケット"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        Args:
+            rate: 1秒あたりに補充されるトークン数（0以下で無制限）
+            capacity: バケットの最大トークン数（バースト許容量）。省略時はrateと同じ
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity else max(self.rate, 1.0)
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """
+        トークンを取得する（足りない場合は補充されるまで待機）
+
+        Args:
+            tokens: 取得するトークン数
+
+        Returns:
+            待機した秒数
+        """
+        if self.rate <= 0:
+            return 0.0
+
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                # 不足分が補充されるまでの時間
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
@@ -2,40 +2,213 @@
 週次レポート生成モジュール
 株価データと会社情報をまとめたレポートを生成します
 """
+import json
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from typing import List, Dict
+from functools import partial
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+import numpy as np
 import pandas as pd
 import matplotlib
 matplotlib.use('Agg')  # GUI不要のバックエンドを使用
-import matplotlib.pyplot as plt
-import seaborn as sns
-from jinja2 import Template
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
 import logging
+from chart_cache import ChartCache
+from indicators import INDICATOR_COLUMNS
+from metrics import NULL_METRICS, RunMetrics, TimedFile
+from shard import write_shard_result
+from stock_record import StockRecord
+from svg_chart import is_inline_chart, render_svg_chart, render_svg_heatmap
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# 日本語フォント設定
-plt.rcParams['font.family'] = 'DejaVu Sans'
-sns.set_style("whitegrid")
+# テンプレートの配置場所
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+REPORT_TEMPLATE = "weekly_report.html"
+CARD_TEMPLATE = "_stock_card.html"
+SHARDED_INDEX_TEMPLATE = "sharded_index.html"
+SHARDED_PAGE_TEMPLATE = "sharded_page.html"
+
+# Excel・CSV形式で出力する列
+SUMMARY_COLUMNS = [
+    'ticker', 'company_name', 'sector', 'industry', 'current_price', 'currency',
+    'market_cap', 'pe_ratio', 'dividend_yield', '52_week_high', '52_week_low',
+    'week_change_pct', 'month_change_pct', 'year_change_pct',
+    *INDICATOR_COLUMNS, 'fetched_at', 'error',
+]
+HISTORY_COLUMNS = ['ticker', 'date', 'close']
+
+# Excelの1シートあたりの最大行数（ヘッダー行を含む）
+EXCEL_MAX_ROWS = 1048576
+
+_template_environment = None
+
+
+def get_template_environment() -> Environment:
+    """
+    レポート用のJinja環境を取得する（プロセスごとに1回だけ作成）
+    
+    コンパイル済みテンプレートは環境内にキャッシュされ、
+    バイトコードはファイルにも保存されるため再起動後も再コンパイルしません。
+    """
+    global _template_environment
+    if _template_environment is None:
+        environment = Environment(
+            loader=FileSystemLoader(TEMPLATE_DIR),
+            bytecode_cache=FileSystemBytecodeCache(),
+            auto_reload=False
+        )
+        environment.globals['zip'] = zip
+        environment.tests['inline_chart'] = is_inline_chart
+        _template_environment = environment
+    return _template_environment
+
+
+# チャートの描画パラメータ（変更するとチャートキャッシュのキーも変わる）
+CHART_FIGSIZE = (12, 6)
+CHART_DPI = 150
+
+
+_chart_style_cache = None
+
+
+def _chart_style() -> Dict:
+    """
+    チャート描画用のrcParams
+    
+    グローバルなrcParamsを変更しないよう、描画時にrc_contextで適用します。
+    seabornは初回の描画時に読み込みます。
+    """
+    global _chart_style_cache
+    if _chart_style_cache is None:
+        import seaborn as sns
+        style = dict(sns.axes_style("whitegrid"))
+        # 日本語フォント設定
+        style['font.family'] = 'DejaVu Sans'
+        _chart_style_cache = style
+    return _chart_style_cache
+
+
+def render_price_chart(ticker: str, company_name: str, dates: np.ndarray,
+                       closes: np.ndarray, chart_path: str) -> str:
+    """
+    1銘柄の価格推移チャートをPNGに保存する
+    
+    pyplotのグローバル状態を使わずFigure/Aggで描画するため、
+    プロセスプールのワーカーからも呼び出せます。
+    
+    Args:
+        ticker: ティッカーシンボル
+        company_name: 会社名
+        dates: 日付の配列
+        closes: 終値の配列
+        chart_path: 保存先のパス
+        
+    Returns:
+        保存したファイルのパス
+    """
+    with matplotlib.rc_context(_chart_style()):
+        fig = Figure(figsize=CHART_FIGSIZE)
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
+        ax.plot(dates, closes, linewidth=2, color='#3498db')
+        ax.fill_between(dates, closes, alpha=0.3, color='#3498db')
+        ax.set_title(f'{company_name} ({ticker}) - 1 Year Price Trend',
+                     fontsize=14, fontweight='bold', pad=20)
+        ax.set_xlabel('Date', fontsize=12)
+        ax.set_ylabel('Price', fontsize=12)
+        ax.grid(True, alpha=0.3)
+        ax.tick_params(axis='x', labelrotation=45)
+        fig.tight_layout()
+        fig.savefig(chart_path, dpi=CHART_DPI, bbox_inches='tight')
+    return chart_path
+
+
+def render_correlation_heatmap(matrix: pd.DataFrame, chart_path: str) -> str:
+    """
+    相関行列のヒートマップをPNGに保存する
+    
+    行列はcorrelation.analyze_correlation()でクラスタ順に並べ替え済みのものを使います。
+    
+    Args:
+        matrix: 相関行列（ティッカー × ティッカー）
+        chart_path: 保存先のパス
+        
+    Returns:
+        保存したファイルのパス
+    """
+    import seaborn as sns
+    
+    size = min(20, max(6, 0.3 * len(matrix) + 3))
+    with matplotlib.rc_context(_chart_style()):
+        fig = Figure(figsize=(size, size))
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
+        sns.heatmap(
+            matrix, ax=ax, cmap='RdBu_r', vmin=-1, vmax=1, center=0, square=True,
+            annot=len(matrix) <= 15, fmt='.2f', xticklabels=True, yticklabels=True,
+            cbar_kws={'shrink': 0.7}
+        )
+        ax.set_title('Daily Return Correlation', fontsize=14, fontweight='bold', pad=20)
+        fig.tight_layout()
+        fig.savefig(chart_path, dpi=CHART_DPI, bbox_inches='tight')
+    return chart_path
 
 
 class ReportGenerator:
     """レポート生成クラス"""
     
-    def __init__(self, output_dir: str = "./reports"):
+    def __init__(self, output_dir: str = "./reports", chart_workers: int = 1,
+                 chart_cache: Optional[ChartCache] = None,
+                 release_history_after_charts: bool = False,
+                 metrics: Optional[RunMetrics] = None,
+                 chart_backend: str = "png", svg_max_points: int = 200,
+                 report_time: Optional[datetime] = None):
+        """
+        Args:
+            output_dir: レポートの出力先ディレクトリ
+            chart_workers: チャートを並列描画するプロセス数（1で逐次描画）
+            chart_cache: 描画済みチャートのキャッシュ（Noneで毎回描画）
+            release_history_after_charts: チャート描画後にStockRecordの価格データを解放するか
+            metrics: 処理時間・エラー数の記録先（Noneで記録しない）
+            chart_backend: チャートの形式（"png": matplotlibで画像ファイルに描画 /
+                "svg": 間引いた系列をSVGとしてHTMLに埋め込む）
+            svg_max_points: chart_backendが"svg"のときにチャートに描画する最大点数
+            report_time: レポートの日時（ファイル名・表示に使う。省略時は生成時の現在時刻。
+                過去の日付のレポートを作り直すときに指定する）
+        """
+        if chart_backend not in ("png", "svg"):
+            raise ValueError(f"未対応のチャート形式です: {chart_backend}")
         self.output_dir = output_dir
+        self.chart_workers = max(1, int(chart_workers))
+        self.chart_cache = chart_cache
+        self.release_history_after_charts = release_history_after_charts
+        self._chart_executor = None
+        self.metrics = metrics or NULL_METRICS
+        self.chart_backend = chart_backend
+        self.svg_max_points = svg_max_points
+        self.report_time = report_time
         os.makedirs(output_dir, exist_ok=True)
         os.makedirs(os.path.join(output_dir, "charts"), exist_ok=True)
     
-    def generate_html_report(self, stocks_data: List[Dict], price_changes: List[Dict]) -> str:
+    def generate_html_report(self, stocks_data: List[Dict], price_changes: List[Dict],
+                             indicators: Optional[Dict[str, Dict]] = None,
+                             correlation: Optional[Dict] = None,
+                             comparison: Optional[Dict] = None) -> str:
         """
         HTMLレポートを生成
         
         Args:
             stocks_data: 株価データのリスト
             price_changes: 価格変動データのリスト
+            indicators: テクニカル指標の辞書（ティッカー -> {指標名: 値}）
+            correlation: correlation.analyze_correlation()の結果
+            comparison: SnapshotArchive.compare()の結果（前回レポートとの比較）
             
         Returns:
             生成されたHTMLファイルのパス
@@ -43,364 +216,584 @@ class ReportGenerator:
         # チャートを生成
         chart_paths = self._generate_charts(stocks_data)
         
+        # テンプレートは価格データを使わないため、ここで解放してメモリを抑える
+        if self.release_history_after_charts:
+            for stock_data in stocks_data:
+                if isinstance(stock_data, StockRecord):
+                    stock_data.release_history()
+        
+        return self.write_html_report(stocks_data, price_changes, chart_paths,
+                                      indicators=indicators, correlation=correlation,
+                                      comparison=comparison)
+    
+    def write_html_report(self, stocks_data: List[Dict], price_changes: List[Dict],
+                          chart_paths: Dict[str, str],
+                          rendered_cards: Optional[Iterable[str]] = None,
+                          indicators: Optional[Dict[str, Dict]] = None,
+                          correlation: Optional[Dict] = None,
+                          comparison: Optional[Dict] = None) -> str:
+        """
+        テンプレートを描画してHTMLファイルにストリーミングで書き出す
+        
+        Args:
+            stocks_data: 株価データのリスト（サマリー表に使う）
+            price_changes: 価格変動データのリスト
+            chart_paths: チャートファイルパスの辞書（ティッカー -> パスまたは埋め込み用のSVG）
+            rendered_cards: 描画済みの銘柄カードHTML（省略時はstocks_dataから描画する）
+            indicators: テクニカル指標の辞書（ティッカー -> {指標名: 値}）
+            correlation: correlation.analyze_correlation()の結果
+            comparison: SnapshotArchive.compare()の結果（前回レポートとの比較）
+            
+        Returns:
+            生成されたHTMLファイルのパス
+        """
         # レポート日時
-        report_date = datetime.now().strftime("%Y年%m月%d日 %H:%M")
-        
-        # HTMLテンプレート
-        html_template = """
-<!DOCTYPE html>
-<html lang="ja">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>週次株価レポート - {{ report_date }}</title>
-    <style>
-        body {
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-            line-height: 1.6;
-            margin: 0;
-            padding: 20px;
-            background-color: #f5f5f5;
-        }
-        .container {
-            max-width: 1200px;
-            margin: 0 auto;
-            background-color: white;
-            padding: 30px;
-            border-radius: 10px;
-            box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-        }
-        h1 {
-            color: #2c3e50;
-            border-bottom: 3px solid #3498db;
-            padding-bottom: 10px;
-        }
-        h2 {
-            color: #34495e;
-            margin-top: 30px;
-            border-left: 4px solid #3498db;
-            padding-left: 10px;
-        }
-        .stock-card {
-            border: 1px solid #ddd;
-            border-radius: 8px;
-            padding: 20px;
-            margin: 20px 0;
-            background-color: #fafafa;
-        }
-        .stock-header {
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            margin-bottom: 15px;
-        }
-        .stock-name {
-            font-size: 24px;
-            font-weight: bold;
-            color: #2c3e50;
-        }
-        .stock-ticker {
-            font-size: 18px;
-            color: #7f8c8d;
-        }
-        .price-info {
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
-            gap: 15px;
-            margin: 15px 0;
-        }
-        .price-box {
-            background-color: white;
-            padding: 15px;
-            border-radius: 5px;
-            border-left: 4px solid #3498db;
-        }
-        .price-label {
-            font-size: 12px;
-            color: #7f8c8d;
-            text-transform: uppercase;
-        }
-        .price-value {
-            font-size: 20px;
-            font-weight: bold;
-            color: #2c3e50;
-        }
-        .change-positive {
-            color: #27ae60;
-        }
-        .change-negative {
-            color: #e74c3c;
-        }
-        .company-info {
-            margin-top: 15px;
-            padding: 15px;
-            background-color: white;
-            border-radius: 5px;
-        }
-        .info-row {
-            display: flex;
-            padding: 8px 0;
-            border-bottom: 1px solid #ecf0f1;
-        }
-        .info-label {
-            font-weight: bold;
-            width: 150px;
-            color: #34495e;
-        }
-        .info-value {
-            color: #7f8c8d;
-        }
-        .chart-container {
-            margin: 20px 0;
-            text-align: center;
-        }
-        .chart-container img {
-            max-width: 100%;
-            height: auto;
-            border-radius: 5px;
-            box-shadow: 0 2px 5px rgba(0,0,0,0.1);
-        }
-        .summary-table {
-            width: 100%;
-            border-collapse: collapse;
-            margin: 20px 0;
-        }
-        .summary-table th,
-        .summary-table td {
-            padding: 12px;
-            text-align: left;
-            border-bottom: 1px solid #ddd;
-        }
-        .summary-table th {
-            background-color: #3498db;
-            color: white;
-        }
-        .summary-table tr:hover {
-            background-color: #f5f5f5;
-        }
-        .footer {
-            margin-top: 40px;
-            padding-top: 20px;
-            border-top: 2px solid #ecf0f1;
-            text-align: center;
-            color: #7f8c8d;
-            font-size: 14px;
+        report_date = self.now().strftime("%Y年%m月%d日 %H:%M")
+        
+        filename = f"stock_report_{self.now().strftime('%Y%m%d_%H%M%S')}.html"
+        filepath = os.path.join(self.output_dir, filename)
+        
+        context = {
+            'stocks_data': stocks_data,
+            'price_changes': price_changes,
+            'report_date': report_date,
+            'chart_paths': chart_paths,
+            'indicators': indicators or {},
+            'correlation': self._correlation_context(correlation),
+            'comparison': comparison,
         }
-    </style>
-</head>
-<body>
-    <div class="container">
-        <h1>📊 週次株価レポート</h1>
-        <p style="color: #7f8c8d;">レポート生成日時: {{ report_date }}</p>
-        
-        <h2>📈 サマリー</h2>
-        <table class="summary-table">
-            <thead>
-                <tr>
-                    <th>ティッカー</th>
-                    <th>会社名</th>
-                    <th>現在価格</th>
-                    <th>1週間変動</th>
-                    <th>1ヶ月変動</th>
-                    <th>セクター</th>
-                </tr>
-            </thead>
-            <tbody>
-                {% for stock, changes in zip(stocks_data, price_changes) %}
-                {% if 'error' not in stock %}
-                <tr>
-                    <td><strong>{{ stock.ticker }}</strong></td>
-                    <td>{{ stock.company_name }}</td>
-                    <td>{{ "%.2f"|format(stock.current_price) }} {{ stock.currency }}</td>
-                    <td>
-                        {% if 'week_change' in changes %}
-                        <span class="{{ 'change-positive' if changes.week_change.percentage >= 0 else 'change-negative' }}">
-                            {{ "%+.2f"|format(changes.week_change.percentage) }}%
-                        </span>
-                        {% else %}N/A{% endif %}
-                    </td>
-                    <td>
-                        {% if 'month_change' in changes %}
-                        <span class="{{ 'change-positive' if changes.month_change.percentage >= 0 else 'change-negative' }}">
-                            {{ "%+.2f"|format(changes.month_change.percentage) }}%
-                        </span>
-                        {% else %}N/A{% endif %}
-                    </td>
-                    <td>{{ stock.sector }}</td>
-                </tr>
-                {% endif %}
-                {% endfor %}
-            </tbody>
-        </table>
-        
-        {% for stock, changes in zip(stocks_data, price_changes) %}
-        {% if 'error' not in stock %}
-        <div class="stock-card">
-            <div class="stock-header">
-                <div>
-                    <div class="stock-name">{{ stock.company_name }}</div>
-                    <div class="stock-ticker">{{ stock.ticker }}</div>
-                </div>
-            </div>
+        if rendered_cards is not None:
+            context['rendered_cards'] = rendered_cards
+        
+        template = get_template_environment().get_template(REPORT_TEMPLATE)
+        self._dump_template(template, filepath, **context)
+        
+        logger.info(f"HTMLレポートを生成しました: {filepath}")
+        return filepath
+    
+    def generate_sharded_report(self, stocks_data: List[Dict], price_changes: List[Dict],
+                                group_by: str = "count", page_size: int = 200,
+                                indicators: Optional[Dict[str, Dict]] = None,
+                                correlation: Optional[Dict] = None,
+                                chart_paths: Optional[Dict[str, str]] = None,
+                                comparison: Optional[Dict] = None) -> str:
+        """
+        銘柄数が多い場合向けに、インデックスと複数の詳細ページに分けたHTMLレポートを生成
+        
+        stock_report_<日時>/ ディレクトリに、サマリー表だけを持つindex.html、
+        サマリー表のデータ（summary.json）、銘柄カードを分割した詳細ページを書き出します。
+        詳細ページは1ページずつ描画するため、メモリ使用量は1ページ分に収まります。
+        
+        Args:
+            stocks_data: 株価データのリスト
+            price_changes: 価格変動データのリスト
+            group_by: 詳細ページの分け方（"count": page_size件ごと / "sector": セクターごと）
+            page_size: group_byが"count"のときの1ページあたりの銘柄数
+            indicators: テクニカル指標の辞書（ティッカー -> {指標名: 値}）
+            correlation: correlation.analyze_correlation()の結果
+            chart_paths: 描画済みのチャートの辞書（シャードの結合時など。省略時はここで描画する）
+            comparison: SnapshotArchive.compare()の結果（前回レポートとの比較）
             
-            <div class="price-info">
-                <div class="price-box">
-                    <div class="price-label">現在価格</div>
-                    <div class="price-value">{{ "%.2f"|format(stock.current_price) }} {{ stock.currency }}</div>
-                </div>
-                {% if 'week_change' in changes %}
-                <div class="price-box">
-                    <div class="price-label">1週間変動</div>
-                    <div class="price-value {{ 'change-positive' if changes.week_change.percentage >= 0 else 'change-negative' }}">
-                        {{ "%+.2f"|format(changes.week_change.percentage) }}%
-                        ({{ "%+.2f"|format(changes.week_change.absolute) }} {{ stock.currency }})
-                    </div>
-                </div>
-                {% endif %}
-                {% if 'month_change' in changes %}
-                <div class="price-box">
-                    <div class="price-label">1ヶ月変動</div>
-                    <div class="price-value {{ 'change-positive' if changes.month_change.percentage >= 0 else 'change-negative' }}">
-                        {{ "%+.2f"|format(changes.month_change.percentage) }}%
-                        ({{ "%+.2f"|format(changes.month_change.absolute) }} {{ stock.currency }})
-                    </div>
-                </div>
-                {% endif %}
-                {% if 'year_change' in changes %}
-                <div class="price-box">
-                    <div class="price-label">1年変動</div>
-                    <div class="price-value {{ 'change-positive' if changes.year_change.percentage >= 0 else 'change-negative' }}">
-                        {{ "%+.2f"|format(changes.year_change.percentage) }}%
-                        ({{ "%+.2f"|format(changes.year_change.absolute) }} {{ stock.currency }})
-                    </div>
-                </div>
-                {% endif %}
-            </div>
+        Returns:
+            生成されたindex.htmlのパス
+        """
+        if chart_paths is None:
+            chart_paths = self._generate_charts(stocks_data)
+        
+        if self.release_history_after_charts:
+            for stock_data in stocks_data:
+                if isinstance(stock_data, StockRecord):
+                    stock_data.release_history()
+        
+        report_date = self.now().strftime("%Y年%m月%d日 %H:%M")
+        report_dir = os.path.join(
+            self.output_dir, f"stock_report_{self.now().strftime('%Y%m%d_%H%M%S')}"
+        )
+        os.makedirs(report_dir, exist_ok=True)
+        
+        items = [
+            (stock_data, changes)
+            for stock_data, changes in zip(stocks_data, price_changes)
+            if 'error' not in stock_data
+        ]
+        groups = self._group_pages(items, group_by, page_size)
+        
+        # 詳細ページはレポートディレクトリの中にあるため、チャートは1階層上を参照する
+        page_chart_paths = {ticker: path if is_inline_chart(path) else f"../{path}"
+                            for ticker, path in chart_paths.items()}
+        environment = get_template_environment()
+        page_template = environment.get_template(SHARDED_PAGE_TEMPLATE)
+        
+        indicators = indicators or {}
+        pages = []
+        rows = []
+        for page_number, (title, page_items) in enumerate(groups):
+            filename = (f"sector_{page_number + 1:03d}.html" if group_by == "sector"
+                        else f"page_{page_number + 1:03d}.html")
+            self._dump_template(
+                page_template, os.path.join(report_dir, filename),
+                page_title=title, report_date=report_date,
+                items=page_items, chart_paths=page_chart_paths
+            )
+            pages.append({'file': filename, 'title': title, 'count': len(page_items)})
             
-            <div class="company-info">
-                <h3 style="color: #34495e; margin-top: 0;">会社情報</h3>
-                <div class="info-row">
-                    <div class="info-label">セクター:</div>
-                    <div class="info-value">{{ stock.sector }}</div>
-                </div>
-                <div class="info-row">
-                    <div class="info-label">業界:</div>
-                    <div class="info-value">{{ stock.industry }}</div>
-                </div>
-                {% if stock.market_cap %}
-                <div class="info-row">
-                    <div class="info-label">時価総額:</div>
-                    <div class="info-value">{{ "{:,.0f}".format(stock.market_cap) }} {{ stock.currency }}</div>
-                </div>
-                {% endif %}
-                {% if stock.pe_ratio %}
-                <div class="info-row">
-                    <div class="info-label">PER:</div>
-                    <div class="info-value">{{ "%.2f"|format(stock.pe_ratio) }}</div>
-                </div>
-                {% endif %}
-                {% if stock.dividend_yield %}
-                <div class="info-row">
-                    <div class="info-label">配当利回り:</div>
-                    <div class="info-value">{{ "%.2f"|format(stock.dividend_yield * 100) }}%</div>
-                </div>
-                {% endif %}
-                {% if stock.website %}
-                <div class="info-row">
-                    <div class="info-label">ウェブサイト:</div>
-                    <div class="info-value"><a href="{{ stock.website }}" target="_blank">{{ stock.website }}</a></div>
-                </div>
-                {% endif %}
-                {% if stock.description and stock.description != 'N/A' %}
-                <div class="info-row" style="flex-direction: column;">
-                    <div class="info-label" style="margin-bottom: 5px;">会社概要:</div>
-                    <div class="info-value">{{ stock.description[:500] }}{% if stock.description|length > 500 %}...{% endif %}</div>
-                </div>
-                {% endif %}
-            </div>
+            for stock_data, changes in page_items:
+                ind = indicators.get(stock_data['ticker'], {})
+                rows.append([
+                    stock_data['ticker'],
+                    stock_data.get('company_name') or stock_data['ticker'],
+                    self._round(stock_data.get('current_price')),
+                    stock_data.get('currency') or '',
+                    self._round(changes.get('week_change', {}).get('percentage')),
+                    self._round(changes.get('month_change', {}).get('percentage')),
+                    self._round(changes.get('year_change', {}).get('percentage')),
+                    self._round(ind.get('rsi_14')),
+                    self._round(ind.get('volatility_pct')),
+                    self._round(ind.get('max_drawdown_pct')),
+                    self._round(ind.get('from_52w_high_pct')),
+                    stock_data.get('sector') or '',
+                    page_number,
+                ])
+        
+        # サマリー表のデータは列名と値の配列に分けて書き出し、ファイルを小さくする
+        summary = {
+            'report_date': report_date,
+            'columns': ['ticker', 'company_name', 'current_price', 'currency',
+                        'week_pct', 'month_pct', 'year_pct', 'rsi_14', 'volatility_pct',
+                        'max_drawdown_pct', 'from_52w_high_pct', 'sector', 'page'],
+            'rows': rows,
+            'pages': pages,
+        }
+        summary_file = "summary.json"
+        with self.metrics.stage('file_write'):
+            with open(os.path.join(report_dir, summary_file), 'w', encoding='utf-8') as f:
+                json.dump(summary, f, ensure_ascii=False, separators=(',', ':'))
+        
+        index_path = os.path.join(report_dir, "index.html")
+        self._dump_template(
+            environment.get_template(SHARDED_INDEX_TEMPLATE), index_path,
+            report_date=report_date, stock_count=len(items),
+            pages=pages, summary_file=summary_file,
+            correlation=self._correlation_context(correlation, path_prefix="../"),
+            comparison=comparison
+        )
+        
+        logger.info(f"分割HTMLレポートを生成しました: {index_path}（{len(pages)}ページ）")
+        return index_path
+    
+    @staticmethod
+    def _round(value: Optional[float], digits: int = 4) -> Optional[float]:
+        """summary.json用に数値を丸める（値が無い場合はNone）"""
+        if value is None or pd.isna(value):
+            return None
+        return round(float(value), digits)
+    
+    @staticmethod
+    def _group_pages(items: List[tuple], group_by: str, page_size: int) -> List[tuple]:
+        """
+        銘柄を詳細ページごとに分ける
+        
+        Returns:
+            (ページタイトル, そのページの(株価データ, 価格変動データ)のリスト) のリスト
+        """
+        if group_by == "sector":
+            sectors = {}
+            for item in items:
+                sectors.setdefault(item[0].get('sector') or "その他", []).append(item)
+            return sorted(sectors.items(), key=lambda group: group[0])
+        
+        if group_by != "count":
+            logger.warning(f"未対応のページ分割方法です: {group_by}（件数で分割します）")
+        page_size = max(1, int(page_size))
+        return [
+            (f"銘柄 {start + 1}〜{min(start + page_size, len(items))}", items[start:start + page_size])
+            for start in range(0, len(items), page_size)
+        ]
+    
+    def generate_shard_result(self, stocks_data: List[Dict], price_changes: List[Dict],
+                              shard: tuple, shard_path: str,
+                              indicators: Optional[Dict[str, Dict]] = None,
+                              close_panel: Optional[pd.DataFrame] = None) -> str:
+        """
+        シャード実行の結果（チャートを描画し、最終レポートの作成に必要な値）を中間ファイルに書き出す
+        
+        チャートは通常のレポートと同じ charts/ に描画し、中間ファイルにはその相対パスを記録します。
+        
+        Args:
+            stocks_data: 株価データのリスト
+            price_changes: 価格変動データのリスト
+            shard: (シャード番号, シャード数)
+            shard_path: 中間ファイルのパス
+            indicators: テクニカル指標の辞書（ティッカー -> {指標名: 値}）
+            close_panel: 日付 × ティッカーの終値パネル
             
-            {% if stock.ticker in chart_paths %}
-            <div class="chart-container">
-                <h3 style="color: #34495e;">価格推移チャート</h3>
-                <img src="{{ chart_paths[stock.ticker] }}" alt="{{ stock.ticker }} チャート">
-            </div>
-            {% endif %}
-        </div>
-        {% endif %}
-        {% endfor %}
-        
-        <div class="footer">
-            <p>このレポートは自動生成されました。</p>
-            <p>投資判断は自己責任でお願いいたします。</p>
-        </div>
-    </div>
-</body>
-</html>
+        Returns:
+            書き出した中間ファイルのパス
         """
+        chart_paths = self._generate_charts(stocks_data)
         
-        template = Template(html_template)
-        html_content = template.render(
-            stocks_data=stocks_data,
-            price_changes=price_changes,
-            report_date=report_date,
-            chart_paths=chart_paths,
-            zip=zip
-        )
+        with self.metrics.stage('file_write'):
+            write_shard_result(
+                shard_path, shard, stocks_data, price_changes, chart_paths,
+                indicators or {}, close_panel if close_panel is not None else pd.DataFrame(dtype=float)
+            )
+        
+        logger.info(f"シャードの中間ファイルを生成しました: {shard_path}")
+        return shard_path
+    
+    def generate_excel_report(self, stocks_data: List[Dict], price_changes: List[Dict],
+                              indicators: Optional[Dict[str, Dict]] = None) -> str:
+        """
+        Excelレポートを生成
+        
+        openpyxlの書き込み専用モードで1行ずつ書き出すため、ブック全体をメモリに保持しません。
+        summaryシートに銘柄ごとのサマリー、historyシートに日足の終値を書き出します。
+        価格履歴がExcelの最大行数を超える場合は history_2, history_3, ... に分けます。
+        
+        Args:
+            stocks_data: 株価データのリスト
+            price_changes: 価格変動データのリスト
+            indicators: テクニカル指標の辞書（ティッカー -> {指標名: 値}）
+            
+        Returns:
+            生成されたExcelファイルのパス
+        """
+        from openpyxl import Workbook
         
-        # HTMLファイルを保存
-        filename = f"stock_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html"
+        filename = f"stock_report_{self.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
         filepath = os.path.join(self.output_dir, filename)
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(html_content)
+        write_started = time.perf_counter()
+        workbook = Workbook(write_only=True)
+        summary_sheet = workbook.create_sheet("summary")
+        summary_sheet.append(SUMMARY_COLUMNS)
+        for row in self._summary_rows(stocks_data, price_changes, indicators):
+            summary_sheet.append(row)
         
-        logger.info(f"HTMLレポートを生成しました: {filepath}")
+        history_sheet = None
+        sheet_count = 0
+        row_count = EXCEL_MAX_ROWS
+        for history in self._history_frames(stocks_data):
+            # 1銘柄の履歴が途中で別シートに分かれないように、入りきらなければ次のシートへ
+            if row_count + len(history) > EXCEL_MAX_ROWS:
+                sheet_count += 1
+                history_sheet = workbook.create_sheet(
+                    "history" if sheet_count == 1 else f"history_{sheet_count}"
+                )
+                history_sheet.append(HISTORY_COLUMNS)
+                row_count = 1
+            for row in history.itertuples(index=False, name=None):
+                history_sheet.append(row)
+            row_count += len(history)
+        
+        workbook.save(filepath)
+        self.metrics.add_stage('file_write', time.perf_counter() - write_started)
+        
+        logger.info(f"Excelレポートを生成しました: {filepath}")
         return filepath
     
-    def _generate_charts(self, stocks_data: List[Dict]) -> Dict[str, str]:
+    def generate_csv_report(self, stocks_data: List[Dict], price_changes: List[Dict],
+                            indicators: Optional[Dict[str, Dict]] = None,
+                            chunk_tickers: int = 500) -> str:
         """
-        各株の価格推移チャートを生成
+        CSVレポートを生成
+        
+        stock_report_<日時>_summary.csv にサマリー、stock_report_<日時>_history.csv に
+        日足の終値を書き出します。価格履歴はchunk_tickers銘柄ごとにまとめて書き出します。
+        Excelで文字化けしないようにBOM付きUTF-8で出力します。
         
         Args:
             stocks_data: 株価データのリスト
+            price_changes: 価格変動データのリスト
+            indicators: テクニカル指標の辞書（ティッカー -> {指標名: 値}）
+            chunk_tickers: 価格履歴を1回で書き出す銘柄数
             
         Returns:
-            チャートファイルパスの辞書（ティッカー -> パス）
+            生成されたサマリーCSVファイルのパス
         """
-        chart_paths = {}
+        prefix = f"stock_report_{self.now().strftime('%Y%m%d_%H%M%S')}"
+        summary_path = os.path.join(self.output_dir, f"{prefix}_summary.csv")
+        history_path = os.path.join(self.output_dir, f"{prefix}_history.csv")
+        
+        write_started = time.perf_counter()
+        summary = pd.DataFrame(
+            list(self._summary_rows(stocks_data, price_changes, indicators)),
+            columns=SUMMARY_COLUMNS
+        )
+        summary.to_csv(summary_path, index=False, encoding='utf-8-sig')
         
+        # BOMが途中に入らないよう、ファイルは一度だけ開いて追記していく
+        with open(history_path, 'w', encoding='utf-8-sig', newline='') as f:
+            f.write(",".join(HISTORY_COLUMNS) + "\n")
+            chunk = []
+            for history in self._history_frames(stocks_data):
+                chunk.append(history)
+                if len(chunk) >= chunk_tickers:
+                    pd.concat(chunk, ignore_index=True).to_csv(f, header=False, index=False)
+                    chunk = []
+            if chunk:
+                pd.concat(chunk, ignore_index=True).to_csv(f, header=False, index=False)
+        self.metrics.add_stage('file_write', time.perf_counter() - write_started)
+        
+        logger.info(f"CSVレポートを生成しました: {summary_path}, {history_path}")
+        return summary_path
+    
+    def _summary_rows(self, stocks_data: List[Dict], price_changes: List[Dict],
+                      indicators: Optional[Dict[str, Dict]] = None) -> Iterator[list]:
+        """SUMMARY_COLUMNSの順に並べたサマリーの行を返す"""
+        indicators = indicators or {}
+        for stock_data, changes in zip(stocks_data, price_changes):
+            ind = indicators.get(stock_data.get('ticker'), {})
+            row = []
+            for column in SUMMARY_COLUMNS:
+                if column.endswith('_change_pct'):
+                    value = changes.get(column[:-len('_pct')], {}).get('percentage')
+                elif column in INDICATOR_COLUMNS:
+                    value = ind.get(column)
+                else:
+                    value = stock_data.get(column)
+                # NaNはExcelで壊れたセルになるため空欄にする
+                if isinstance(value, (float, np.floating)) and np.isnan(value):
+                    value = None
+                row.append(value)
+            yield row
+    
+    def _history_frames(self, stocks_data: List[Dict]) -> Iterator[pd.DataFrame]:
+        """
+        銘柄ごとの日足の終値をHISTORY_COLUMNSのDataFrameとして1つずつ返す
+        
+        release_history_after_chartsが有効な場合、返した銘柄の価格データは解放します。
+        """
         for stock_data in stocks_data:
-            if 'error' in stock_data or stock_data.get('ticker') is None:
+            if 'error' in stock_data:
                 continue
-            
-            ticker = stock_data['ticker']
             yearly_data = stock_data.get('yearly_data')
-            
             if yearly_data is None or yearly_data.empty:
                 continue
             
+            dates = yearly_data.index
+            if getattr(dates, 'tz', None) is not None:
+                dates = dates.tz_localize(None)
+            yield pd.DataFrame({
+                'ticker': stock_data['ticker'],
+                'date': dates.date,
+                'close': yearly_data['Close'].to_numpy(dtype=np.float64).round(4),
+            })
+            
+            if self.release_history_after_charts and isinstance(stock_data, StockRecord):
+                stock_data.release_history()
+    
+    def _correlation_context(self, correlation: Optional[Dict],
+                             path_prefix: str = "") -> Optional[Dict]:
+        """
+        相関分析の結果からテンプレート用の値を作成する（ヒートマップもここで描画する）
+        
+        Args:
+            correlation: correlation.analyze_correlation()の結果
+            path_prefix: ヒートマップの相対パスの前に付ける文字列
+            
+        Returns:
+            ticker_count / periods / top_pairs / heatmap_path の辞書（相関分析が無い場合はNone）。
+            chart_backendが"svg"の場合、heatmap_pathは埋め込み用のSVG
+        """
+        if not correlation:
+            return None
+        
+        heatmap_path = None
+        if correlation.get('matrix') is not None and self.chart_backend == "svg":
+            with self.metrics.stage('charts'):
+                heatmap_path = render_svg_heatmap(correlation['matrix'])
+        elif correlation.get('matrix') is not None:
+            filename = f"correlation_{self.now().strftime('%Y%m%d_%H%M%S')}.png"
             try:
-                plt.figure(figsize=(12, 6))
-                plt.plot(yearly_data.index, yearly_data['Close'], linewidth=2, color='#3498db')
-                plt.fill_between(yearly_data.index, yearly_data['Close'], alpha=0.3, color='#3498db')
-                company_name = stock_data.get("company_name", ticker)
-                plt.title(f'{company_name} ({ticker}) - 1 Year Price Trend', 
-                         fontsize=14, fontweight='bold', pad=20)
-                plt.xlabel('Date', fontsize=12)
-                plt.ylabel('Price', fontsize=12)
-                plt.grid(True, alpha=0.3)
-                plt.xticks(rotation=45)
-                plt.tight_layout()
-                
-                chart_filename = f"{ticker}_chart_{datetime.now().strftime('%Y%m%d')}.png"
-                chart_path = os.path.join(self.output_dir, "charts", chart_filename)
-                plt.savefig(chart_path, dpi=150, bbox_inches='tight')
-                plt.close()
-                
-                # HTMLから相対パスで参照できるように
-                chart_paths[ticker] = f"charts/{chart_filename}"
-                
+                with self.metrics.stage('charts'):
+                    render_correlation_heatmap(
+                        correlation['matrix'], os.path.join(self.output_dir, "charts", filename)
+                    )
+                heatmap_path = f"{path_prefix}charts/{filename}"
             except Exception as e:
-                logger.error(f"{ticker} のチャート生成中にエラーが発生しました: {str(e)}")
+                logger.error(f"相関ヒートマップの生成中にエラーが発生しました: {str(e)}")
+                self.metrics.count('chart_errors')
+        
+        return {
+            'ticker_count': correlation['ticker_count'],
+            'periods': correlation['periods'],
+            'top_pairs': correlation['top_pairs'],
+            'heatmap_path': heatmap_path,
+        }
+    
+    def now(self) -> datetime:
+        """レポートの日時（report_timeの指定が無ければ現在時刻。ファイル名・表示・チャートの日付に使う）"""
+        return self.report_time or datetime.now()
+    
+    def _dump_template(self, template, filepath: str, **context) -> None:
+        """
+        テンプレートを描画しながらファイルに書き出す
+        
+        描画と書き込みは交互に行われるため、書き込みにかかった時間をfile_write、
+        残りをtemplate_renderとして記録します。
+        """
+        started = time.perf_counter()
+        stream = template.stream(**context)
+        stream.enable_buffering(size=64)
+        with open(filepath, 'w', encoding='utf-8') as f:
+            writer = TimedFile(f) if self.metrics.enabled else f
+            stream.dump(writer)
+        if self.metrics.enabled:
+            self.metrics.add_stage('file_write', writer.seconds)
+            self.metrics.add_stage('template_render', time.perf_counter() - started - writer.seconds)
+    
+    def render_card(self, stock_data: Dict, changes: Dict, chart_path: Optional[str]) -> str:
+        """
+        1銘柄分のカードHTMLを描画する
+        
+        Args:
+            stock_data: 株価データ
+            changes: 価格変動データ
+            chart_path: チャートの相対パスまたは埋め込み用のSVG（無い場合はNone）
+            
+        Returns:
+            カードのHTML
+        """
+        chart_paths = {stock_data['ticker']: chart_path} if chart_path else {}
+        template = get_template_environment().get_template(CARD_TEMPLATE)
+        return template.render(stock=stock_data, changes=changes, chart_paths=chart_paths)
+    
+    def _generate_charts(self, stocks_data: List[Dict]) -> Dict[str, str]:
+        """
+        各株の価格推移チャートを生成
+        
+        Args:
+            stocks_data: 株価データのリスト
+            
+        Returns:
+            チャートファイルパスの辞書（ティッカー -> パスまたは埋め込み用のSVG）
+        """
+        chart_date = self.now().strftime('%Y%m%d')
+        
+        with self.metrics.stage('charts'):
+            # すべての描画を開始してから結果を待つ（プロセスプールで並列に描画される）
+            pending = [
+                (stock_data['ticker'], self.submit_chart(stock_data, chart_date))
+                for stock_data in stocks_data
+                if 'error' not in stock_data and stock_data.get('ticker') is not None
+            ]
+            
+            chart_paths = {}
+            for ticker, wait in pending:
+                chart_path = wait()
+                if chart_path is not None:
+                    chart_paths[ticker] = chart_path
+            
+            if self.chart_cache is not None:
+                self.chart_cache.evict()
         
         return chart_paths
+    
+    def submit_chart(self, stock_data: Dict,
+                     chart_date: Optional[str] = None) -> Callable[[], Optional[str]]:
+        """
+        1銘柄のチャート描画を開始する
+        
+        chart_workersが2以上の場合はプロセスプールに投入し、すぐに戻ります。
+        キャッシュに同じ入力のチャートがあれば描画しません。
+        chart_backendが"svg"の場合はその場でSVGを作成します（ファイルは書き出さない）。
+        
+        Args:
+            stock_data: 株価データ
+            chart_date: ファイル名に使う日付（YYYYMMDD、省略時は今日）
+            
+        Returns:
+            描画の完了を待ち、チャートの相対パスまたは埋め込み用のSVG（失敗時はNone）を返す関数
+        """
+        task = self._chart_task(stock_data, chart_date or self.now().strftime('%Y%m%d'))
+        if task is None:
+            return lambda: None
+        
+        if self.chart_backend == "svg":
+            try:
+                svg = render_svg_chart(*task[:-1], max_points=self.svg_max_points) or None
+            except Exception as e:
+                logger.error(f"{task[0]} のチャート生成中にエラーが発生しました: {str(e)}")
+                self.metrics.count('chart_errors')
+                svg = None
+            return lambda: svg
+        
+        # HTMLから相対パスで参照できるように
+        relative_path = f"charts/{os.path.basename(task[-1])}"
+        
+        # 入力が同じチャートは描画済みのものを再利用する
+        cache_key = None
+        if self.chart_cache is not None:
+            cache_key = self._chart_cache_key(task)
+            if self.chart_cache.fetch(cache_key, task[-1]):
+                return lambda: relative_path
+        
+        if self.chart_workers > 1:
+            render = self._get_chart_executor().submit(render_price_chart, *task).result
+        else:
+            render = partial(render_price_chart, *task)
+        
+        def wait() -> Optional[str]:
+            try:
+                render()
+            except Exception as e:
+                logger.error(f"{task[0]} のチャート生成中にエラーが発生しました: {str(e)}")
+                self.metrics.count('chart_errors')
+                return None
+            if cache_key is not None:
+                self.chart_cache.store(cache_key, task[-1])
+            return relative_path
+        
+        return wait
+    
+    def _chart_task(self, stock_data: Dict, chart_date: str) -> Optional[tuple]:
+        """
+        render_price_chart()の引数を作成する
+        
+        描画に必要な値だけを取り出し、ワーカープロセスへの受け渡しを軽くします。
+        
+        Returns:
+            引数のタプル（描画するデータが無い場合はNone）
+        """
+        yearly_data = stock_data.get('yearly_data')
+        if yearly_data is None or yearly_data.empty:
+            return None
+        
+        ticker = stock_data['ticker']
+        dates = yearly_data.index
+        if getattr(dates, 'tz', None) is not None:
+            dates = dates.tz_localize(None)
+        chart_filename = f"{ticker}_chart_{chart_date}.png"
+        return (
+            ticker,
+            stock_data.get("company_name", ticker),
+            dates.to_numpy(),
+            yearly_data['Close'].to_numpy(),
+            os.path.join(self.output_dir, "charts", chart_filename),
+        )
+    
+    def _get_chart_executor(self) -> ProcessPoolExecutor:
+        """チャート描画用のプロセスプールを取得する（close()まで使い回す）"""
+        if self._chart_executor is None:
+            self._chart_executor = ProcessPoolExecutor(max_workers=self.chart_workers)
+        return self._chart_executor
+    
+    def close(self) -> None:
+        """チャート描画用のプロセスプールを終了する"""
+        if self._chart_executor is not None:
+            self._chart_executor.shutdown()
+            self._chart_executor = None
+    
+    @staticmethod
+    def _chart_cache_key(task: tuple) -> str:
+        """render_price_chart()の引数からチャートキャッシュのキーを作成する"""
+        ticker, company_name, dates, closes, _ = task
+        params = {
+            'ticker': ticker,
+            'company_name': company_name,
+            'figsize': CHART_FIGSIZE,
+            'dpi': CHART_DPI,
+            'matplotlib': matplotlib.__version__,
+        }
+        return ChartCache.make_key(dates, closes, params)
@@ -0,0 +1,230 @@
+"""
+レポートパイプラインモジュール
+銘柄ごとに「取得 → 価格変動の計算 → チャート描画 → カード描画」を順に流し、
+全銘柄の取得完了を待たずにレポートを書き出します
+
+取得はスレッドプール、チャート描画はReportGeneratorのプロセスプールで行うため、
+ネットワーク待ちとチャート描画が重なって実行されます。処理中の銘柄数は
+max_in_flightで制限され、描画し終えた銘柄の価格データはすぐに解放されます。
+"""
+import os
+import queue
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import logging
+import pandas as pd
+
+from correlation import analyze_correlation
+from indicators import compute_indicators, to_indicator_dicts
+from price_panel import build_close_panel
+from stock_record import StockRecord
+from svg_chart import is_inline_chart
+
+logger = logging.getLogger(__name__)
+
+
+class ReportPipeline:
+    """銘柄単位でパイプライン処理してHTMLレポートを生成するクラス"""
+
+    def __init__(self, fetcher, generator, max_in_flight: int = 32,
+                 correlation_top_k: Optional[int] = None,
+                 correlation_matrix_max_tickers: int = 60,
+                 compare_snapshots: Optional[Callable[[List[Dict], List[Dict]], Optional[Dict]]] = None):
+        """
+        Args:
+            fetcher: StockDataFetcher
+            generator: ReportGenerator
+            max_in_flight: 同時に処理中にできる銘柄数（メモリ使用量の上限になる）
+            correlation_top_k: リターン相関の高いペアの表示件数（Noneで相関を計算しない）
+            correlation_matrix_max_tickers: 相関ヒートマップを描画する銘柄数の上限
+            compare_snapshots: 全銘柄の処理後に (stocks_data, price_changes) を渡して呼び出し、
+                前回レポートとの比較を受け取る関数（Noneで比較しない）
+        """
+        self.fetcher = fetcher
+        self.generator = generator
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.correlation_top_k = correlation_top_k
+        self.correlation_matrix_max_tickers = correlation_matrix_max_tickers
+        self.compare_snapshots = compare_snapshots
+
+    def run(self, tickers: List[str]) -> Tuple[str, List[Dict], List[Dict]]:
+        """
+        ウォッチリストのHTMLレポートを生成する
+
+        Args:
+            tickers: ティッカーシンボルのリスト
+
+        Returns:
+            (レポートのパス, 株価データのリスト, 価格変動データのリスト)。
+            株価データの価格履歴は解放済みです
+        """
+        slots = threading.Semaphore(self.max_in_flight)
+        completed = queue.Queue()
+        # テクニカル指標・相関の計算用に終値だけを残す（価格データ本体は描画後に解放する）
+        closes = {}
+        chart_date = self.generator.now().strftime('%Y%m%d')
+
+        def process(index: int, ticker: str, history=None) -> None:
+            # 取得・価格変動の計算・チャート描画の開始までを1銘柄ずつ行う
+            try:
+                stock_data = self.fetcher.get_stock_info(ticker, history=history)
+                changes = {}
+                wait_chart = None
+                if 'error' not in stock_data:
+                    changes = self.fetcher.calculate_price_change(stock_data)
+                    panel = build_close_panel([stock_data])
+                    if not panel.empty:
+                        closes[ticker] = panel.iloc[:, 0]
+                    wait_chart = self.generator.submit_chart(stock_data, chart_date)
+            except Exception as e:
+                logger.error(f"{ticker} の処理中にエラーが発生しました: {str(e)}")
+                stock_data = {'ticker': ticker, 'error': str(e),
+                              'fetched_at': datetime.now().isoformat()}
+                changes, wait_chart = {}, None
+            completed.put((index, stock_data, changes, wait_chart))
+
+        executor = ThreadPoolExecutor(
+            max_workers=self.fetcher.max_workers, thread_name_prefix="pipeline"
+        )
+        stop = threading.Event()
+        feeder = threading.Thread(
+            target=self._feed, args=(tickers, executor, process, slots, completed, stop),
+            daemon=True
+        )
+        feeder.start()
+
+        cards_file = tempfile.NamedTemporaryFile(
+            mode='w+', encoding='utf-8', suffix='.html', dir=self.generator.output_dir,
+            delete=False
+        )
+        stocks_data = []
+        price_changes = []
+        chart_paths = {}
+
+        def write_card(stock_data: Dict, changes: Dict, wait_chart) -> None:
+            # チャートの描画を待ってカードを書き出し、価格データを解放する
+            chart_path = wait_chart() if wait_chart is not None else None
+            # 埋め込み用のSVGはカードに書き出し済みのため保持しない
+            if chart_path is not None and not is_inline_chart(chart_path):
+                chart_paths[stock_data['ticker']] = chart_path
+            cards_file.write(self.generator.render_card(stock_data, changes, chart_path))
+            if isinstance(stock_data, StockRecord):
+                stock_data.release_history()
+
+        try:
+            try:
+                # 入力順にカードを書き出す（先に終わった銘柄は順番が来るまで保持する）
+                pending = {}
+                for next_index in range(len(tickers)):
+                    while next_index not in pending:
+                        index, stock_data, changes, wait_chart = completed.get()
+                        pending[index] = (stock_data, changes, wait_chart)
+                    stock_data, changes, wait_chart = pending.pop(next_index)
+
+                    if 'error' not in stock_data:
+                        write_card(stock_data, changes, wait_chart)
+                    stocks_data.append(stock_data)
+                    price_changes.append(changes)
+                    slots.release()
+
+                # 失敗した銘柄だけを最後にもう一度処理する（時間予算が残っている場合）。
+                # 取得し直せた銘柄のカードは末尾に追加する
+                failed = [i for i, stock_data in enumerate(stocks_data) if 'error' in stock_data]
+                retry_policy = self.fetcher.retry_policy
+                if failed and retry_policy.retry_failed and retry_policy.remaining() != 0:
+                    logger.info(f"取得に失敗した{len(failed)}件を再取得します")
+                    for index in failed:
+                        executor.submit(process, index, tickers[index])
+                    recovered = 0
+                    for _ in failed:
+                        index, stock_data, changes, wait_chart = completed.get()
+                        if 'error' not in stock_data:
+                            write_card(stock_data, changes, wait_chart)
+                            recovered += 1
+                        stocks_data[index] = stock_data
+                        price_changes[index] = changes
+                    logger.info(f"{recovered}/{len(failed)}件を再取得しました")
+            finally:
+                # 書き出しが途中で失敗した場合も、投入スレッドと取得スレッドを残さない
+                # （空きを1つ返して、空き待ちの投入スレッドに停止を気付かせる）
+                stop.set()
+                slots.release()
+                feeder.join()
+                executor.shutdown(cancel_futures=True)
+
+            cards_file.flush()
+            cards_file.seek(0)
+
+            # テクニカル指標・相関は全銘柄の終値パネルから一括計算する
+            indicators = {}
+            correlation = None
+            if closes:
+                close_panel = pd.DataFrame(closes).sort_index()
+                indicators = to_indicator_dicts(compute_indicators(close_panel))
+                if self.correlation_top_k is not None:
+                    correlation = analyze_correlation(
+                        close_panel, top_k=self.correlation_top_k,
+                        matrix_max_tickers=self.correlation_matrix_max_tickers
+                    )
+
+            report_path = self.generator.write_html_report(
+                stocks_data, price_changes, chart_paths,
+                rendered_cards=self._read_chunks(cards_file),
+                indicators=indicators,
+                correlation=correlation,
+                comparison=(self.compare_snapshots(stocks_data, price_changes)
+                            if self.compare_snapshots is not None else None)
+            )
+        finally:
+            cards_file.close()
+            os.remove(cards_file.name)
+
+        if self.generator.chart_cache is not None:
+            self.generator.chart_cache.evict()
+        if self.fetcher.metadata_cache is not None:
+            self.fetcher.metadata_cache.save()
+
+        return report_path, stocks_data, price_changes
+
+    def _feed(self, tickers: List[str], executor: ThreadPoolExecutor, process,
+              slots: threading.Semaphore, completed: queue.Queue,
+              stop: threading.Event) -> None:
+        """処理中の銘柄数がmax_in_flightを超えないように銘柄を投入する（stopが立てば中断する）"""
+        self.fetcher.index_pool.clear()
+        self.fetcher.retry_policy.start()
+        chunk_size = self.fetcher.bulk_chunk_size if self.fetcher.mode == "bulk" else len(tickers)
+        submitted = 0
+        try:
+            for start in range(0, len(tickers), max(1, chunk_size)):
+                if stop.is_set():
+                    return
+                chunk = tickers[start:start + chunk_size]
+                histories = {}
+                if self.fetcher.mode == "bulk":
+                    # 価格履歴はチャンク単位でまとめて取得する
+                    histories = self.fetcher.download_histories(chunk)
+
+                for ticker in chunk:
+                    slots.acquire()
+                    if stop.is_set():
+                        return
+                    executor.submit(process, submitted, ticker, histories.get(ticker))
+                    submitted += 1
+        except Exception as e:
+            # 書き出し側が待ち続けないよう、残りの銘柄はエラーとして流す
+            logger.error(f"銘柄の投入中にエラーが発生しました: {str(e)}")
+            for index in range(submitted, len(tickers)):
+                completed.put((index, {'ticker': tickers[index], 'error': str(e),
+                                       'fetched_at': datetime.now().isoformat()}, {}, None))
+
+    @staticmethod
+    def _read_chunks(f, size: int = 64 * 1024) -> Iterator[str]:
+        """ファイルを少しずつ読み出す"""
+        while True:
+            chunk = f.read(size)
+            if not chunk:
+                return
+            yield chunk
@@ -0,0 +1,637 @@
+"""
+レポート実行モジュール
+設定の読み込みからデータ取得・レポート生成までをまとめて実行します
+
+ReportRunner はデータ取得クラス・キャッシュ・レポート生成クラスを保持するため、
+スケジューラーから繰り返し呼び出しても毎回作り直す必要がありません。
+重いモジュールはレポートを実際に生成するときに読み込みます。
+"""
+import os
+import time
+import yaml
+import logging
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from report_generator import ReportGenerator
+    from snapshot_archive import SnapshotArchive
+    from stock_data_fetcher import StockDataFetcher
+
+logger = logging.getLogger(__name__)
+
+
+def load_config(config_path: str = "config.yaml") -> dict:
+    """設定ファイルを読み込む"""
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = yaml.safe_load(f)
+        return config
+    except FileNotFoundError:
+        logger.error(f"設定ファイルが見つかりません: {config_path}")
+        raise
+    except yaml.YAMLError as e:
+        logger.error(f"設定ファイルの読み込みエラー: {e}")
+        raise
+
+
+def create_fetcher(config: dict, metrics=None, history_period: Optional[str] = None,
+                   use_price_cache: bool = True) -> "StockDataFetcher":
+    """
+    設定ファイルのfetch/cacheセクションからStockDataFetcherを作成する
+
+    Args:
+        config: 設定
+        metrics: 取得時間・エラー数の記録先
+        history_period: 価格履歴の取得期間（省略時はfetch.history_period）
+        use_price_cache: 価格履歴のキャッシュを使うか（キャッシュはhistory_periodの範囲しか
+            保持しないため、それより長い期間を取得する場合はFalseにする）
+    """
+    from stock_data_fetcher import StockDataFetcher
+    from price_cache import PriceCache
+    from metadata_cache import MetadataCache
+    from resilience import CircuitBreaker, RetryPolicy
+
+    fetch_config = config.get('fetch', {}) or {}
+    cache_config = config.get('cache', {}) or {}
+
+    price_cache = None
+    metadata_cache = None
+    if cache_config.get('enabled', False):
+        output_dir = config.get('report', {}).get('output_dir', './reports')
+        cache_dir = cache_config.get('dir') or os.path.join(output_dir, 'cache')
+        if use_price_cache:
+            price_cache = PriceCache(
+                os.path.join(cache_dir, 'prices.sqlite'),
+                max_age_minutes=cache_config.get('max_age_minutes', 60)
+            )
+        metadata_config = cache_config.get('metadata', {}) or {}
+        metadata_cache = MetadataCache(
+            os.path.join(cache_dir, 'metadata.json'),
+            default_ttl_hours=metadata_config.get('default_ttl_hours', 24),
+            field_ttl_hours=metadata_config.get('field_ttl_hours'),
+            max_entries=metadata_config.get('max_entries', 10000)
+        )
+
+    retry_config = fetch_config.get('retry', {}) or {}
+    breaker_config = fetch_config.get('circuit_breaker', {}) or {}
+    breaker = None
+    if breaker_config.get('enabled', False):
+        breaker = CircuitBreaker(
+            window=breaker_config.get('window', 20),
+            error_rate=breaker_config.get('error_rate', 0.5),
+            cooldown_seconds=breaker_config.get('cooldown_seconds', 30)
+        )
+    retry_policy = RetryPolicy(
+        max_attempts=retry_config.get('max_attempts', 1),
+        base_delay=retry_config.get('base_delay_seconds', 1.0),
+        max_delay=retry_config.get('max_delay_seconds', 30.0),
+        time_budget_seconds=retry_config.get('time_budget_seconds'),
+        breaker=breaker,
+        retry_failed=retry_config.get('retry_failed', False),
+        metrics=metrics
+    )
+
+    return StockDataFetcher(
+        history_period=history_period or fetch_config.get('history_period', '1y'),
+        max_workers=fetch_config.get('max_workers', 1),
+        requests_per_second=fetch_config.get('requests_per_second', 0),
+        burst=fetch_config.get('burst'),
+        mode=fetch_config.get('mode', 'ticker'),
+        bulk_chunk_size=fetch_config.get('bulk_chunk_size', 100),
+        price_cache=price_cache,
+        overlap_days=cache_config.get('overlap_days', 7),
+        metadata_cache=metadata_cache,
+        metrics=metrics,
+        retry_policy=retry_policy,
+    )
+
+
+def create_report_generator(config: dict, metrics=None, report_time: Optional[datetime] = None,
+                            chart_workers: Optional[int] = None) -> "ReportGenerator":
+    """
+    設定ファイルのreportセクションからReportGeneratorを作成する
+
+    Args:
+        config: 設定
+        metrics: 処理時間・エラー数の記録先
+        report_time: レポートの日時（過去の日付のレポートを作り直す場合に指定する）
+        chart_workers: チャートを並列描画するプロセス数（省略時はreport.chart_workers）
+    """
+    from report_generator import ReportGenerator
+    from chart_cache import ChartCache
+
+    report_config = config.get('report', {}) or {}
+    output_dir = report_config.get('output_dir', './reports')
+
+    chart_cache = None
+    chart_cache_config = report_config.get('chart_cache', {}) or {}
+    if chart_cache_config.get('enabled', False):
+        chart_cache = ChartCache(
+            os.path.join(output_dir, 'cache', 'charts'),
+            max_age_days=chart_cache_config.get('max_age_days', 30),
+            max_size_mb=chart_cache_config.get('max_size_mb', 500)
+        )
+    return ReportGenerator(
+        output_dir=output_dir,
+        chart_workers=chart_workers or report_config.get('chart_workers', 1),
+        chart_cache=chart_cache,
+        release_history_after_charts=True,
+        metrics=metrics,
+        chart_backend=report_config.get('chart_backend', 'png'),
+        svg_max_points=report_config.get('svg_max_points', 200),
+        report_time=report_time
+    )
+
+
+def create_snapshot_archive(config: dict) -> Optional["SnapshotArchive"]:
+    """設定ファイルのarchiveセクションからSnapshotArchiveを作成する（無効の場合はNone）"""
+    from snapshot_archive import SnapshotArchive
+
+    archive_config = config.get('archive', {}) or {}
+    if not archive_config.get('enabled', False):
+        return None
+    output_dir = config.get('report', {}).get('output_dir', './reports')
+    return SnapshotArchive(archive_config.get('path') or os.path.join(output_dir, 'snapshots.sqlite'))
+
+
+def write_report(generator: "ReportGenerator", report_config: dict,
+                 stocks_data: List[Dict], price_changes: List[Dict],
+                 indicators: Dict[str, Dict], correlation: Optional[Dict],
+                 chart_paths: Optional[Dict[str, str]] = None,
+                 comparison: Optional[Dict] = None) -> Optional[str]:
+    """
+    設定ファイルのreportセクションで指定された形式でレポートを書き出す
+
+    Args:
+        generator: ReportGenerator
+        report_config: 設定ファイルのreportセクション
+        chart_paths: 描画済みのチャート（シャードの結合時。省略時は描画する）
+        comparison: 前回レポートとの比較（html形式のみ表示する）
+
+    Returns:
+        生成したレポートのパス（未対応の形式の場合はNone）
+    """
+    report_format = report_config.get('format', 'html')
+    sharded_config = report_config.get('sharded', {}) or {}
+    report_path = None
+
+    if report_format == 'html' and sharded_config.get('enabled', False):
+        # 銘柄数が多い場合はインデックスと詳細ページに分けて生成する
+        report_path = generator.generate_sharded_report(
+            stocks_data, price_changes,
+            group_by=sharded_config.get('group_by', 'count'),
+            page_size=sharded_config.get('page_size', 200),
+            indicators=indicators,
+            correlation=correlation,
+            chart_paths=chart_paths,
+            comparison=comparison
+        )
+    elif report_format == 'html' and chart_paths is not None:
+        report_path = generator.write_html_report(
+            stocks_data, price_changes, chart_paths, indicators=indicators,
+            correlation=correlation, comparison=comparison
+        )
+    elif report_format == 'html':
+        report_path = generator.generate_html_report(
+            stocks_data, price_changes, indicators=indicators,
+            correlation=correlation, comparison=comparison
+        )
+    elif report_format == 'excel':
+        report_path = generator.generate_excel_report(
+            stocks_data, price_changes, indicators=indicators
+        )
+    elif report_format == 'csv':
+        report_path = generator.generate_csv_report(
+            stocks_data, price_changes, indicators=indicators
+        )
+    else:
+        logger.warning(f"未対応のレポート形式です: {report_format}")
+
+    if report_path is not None:
+        logger.info(f"レポートが生成されました: {report_path}")
+    return report_path
+
+
+class ReportRunner:
+    """週次レポートを生成するクラス（取得・生成に使うオブジェクトを実行間で保持する）"""
+
+    def __init__(self, config_path: str = "config.yaml"):
+        """
+        Args:
+            config_path: 設定ファイルのパス
+        """
+        self.config_path = config_path
+        self.config = None
+        self.fetcher = None
+        self.generator = None
+        self.archive = None
+        self.metrics = None
+        self._config_mtime = None
+
+    def _refresh(self, with_fetcher: bool = True) -> None:
+        """
+        設定ファイルが更新されていれば読み込み直し、取得・生成オブジェクトを作り直す
+
+        Args:
+            with_fetcher: 取得オブジェクト（価格キャッシュを含む）も用意するか
+                （独自の取得オブジェクトを使う再生成ではFalse）
+        """
+        mtime = os.path.getmtime(self.config_path)
+        if self.config is None or mtime != self._config_mtime:
+            if self.config is not None:
+                logger.info("設定ファイルの変更を検出したため読み込み直します")
+            config = load_config(self.config_path)
+            self.close()
+            self.config = config
+            self._config_mtime = mtime
+
+            from metrics import RunMetrics
+            metrics_config = config.get('metrics', {}) or {}
+            self.metrics = RunMetrics(enabled=metrics_config.get('enabled', False))
+            self.generator = create_report_generator(config, self.metrics)
+            self.archive = create_snapshot_archive(config)
+
+        if with_fetcher and self.fetcher is None:
+            self.fetcher = create_fetcher(self.config, self.metrics)
+
+    def run(self, shard: Optional[Tuple[int, int]] = None) -> None:
+        """
+        週次レポートを生成する
+
+        Args:
+            shard: (シャード番号, シャード数)。指定した場合はそのシャードの銘柄だけを処理し、
+                レポートの代わりに中間ファイルを書き出す（merge()で最終レポートにまとめる）
+        """
+        if shard is None:
+            logger.info("週次レポートの生成を開始します...")
+        else:
+            logger.info(f"シャード {shard[0]}/{shard[1]} の処理を開始します...")
+        report_path = None
+
+        try:
+            import pandas as pd
+            from price_panel import build_close_panel, compute_price_changes, to_change_dicts
+            from indicators import compute_indicators, to_indicator_dicts
+            from correlation import analyze_correlation
+
+            # 設定を読み込む（変更がなければ前回のものを使う）
+            started = time.perf_counter()
+            self._refresh()
+            metrics = self.metrics
+            metrics.reset()
+            metrics.add_stage('config_load', time.perf_counter() - started)
+            config = self.config
+            watchlist = config.get('watchlist', [])
+            report_config = config.get('report', {})
+
+            if not watchlist:
+                logger.warning("ウォッチリストが空です。設定ファイルを確認してください。")
+                return
+
+            shard_path = None
+            if shard is not None:
+                from shard import select_shard, shard_dir, shard_filename
+                watchlist = select_shard(watchlist, *shard)
+                logger.info(f"シャード {shard[0]}/{shard[1]} の担当は{len(watchlist)}銘柄です")
+                output_dir = report_config.get('output_dir', './reports')
+                shard_path = os.path.join(shard_dir(output_dir), shard_filename(*shard))
+
+            fetcher = self.fetcher
+            generator = self.generator
+            report_format = report_config.get('format', 'html')
+            pipeline_config = report_config.get('pipeline', {}) or {}
+            correlation_config = report_config.get('correlation', {}) or {}
+            correlation_enabled = correlation_config.get('enabled', False)
+
+            if shard is not None and not watchlist:
+                # ハッシュの偏りで担当が0銘柄になることがある。結合時に欠けたシャードと
+                # みなされないよう、取得・計算をせずに空の中間ファイルを書き出す
+                stocks_data, price_changes = [], []
+                report_path = generator.generate_shard_result(stocks_data, price_changes, shard, shard_path)
+            elif shard is None and report_format == 'html' and pipeline_config.get('enabled', False):
+                # 銘柄ごとに取得からカード描画までを流すパイプラインで生成する
+                from report_pipeline import ReportPipeline
+
+                logger.info(f"{len(watchlist)}件の株価データをパイプライン処理中...")
+                pipeline = ReportPipeline(
+                    fetcher, generator,
+                    max_in_flight=pipeline_config.get('max_in_flight', 32),
+                    correlation_top_k=(correlation_config.get('top_k', 20)
+                                       if correlation_enabled else None),
+                    correlation_matrix_max_tickers=correlation_config.get('heatmap_max_tickers', 60),
+                    compare_snapshots=self._archive_snapshot
+                )
+                with metrics.stage('pipeline'):
+                    report_path, stocks_data, price_changes = pipeline.run(watchlist)
+                logger.info(f"レポートが生成されました: {report_path}")
+            else:
+                # 株価データを取得
+                logger.info(f"{len(watchlist)}件の株価データを取得中...")
+                with metrics.stage('fetch'):
+                    stocks_data = fetcher.get_multiple_stocks(watchlist)
+
+                # 価格変動を全銘柄まとめて計算
+                with metrics.stage('price_changes'):
+                    close_panel = build_close_panel(stocks_data)
+                    current_prices = pd.Series({
+                        stock_data['ticker']: stock_data.get('current_price')
+                        for stock_data in stocks_data if 'error' not in stock_data
+                    }, dtype=float)
+                    changes_panel = compute_price_changes(close_panel, current_prices)
+                    price_changes = to_change_dicts(changes_panel, stocks_data)
+
+                # テクニカル指標も同じ終値パネルから一括計算
+                with metrics.stage('indicators'):
+                    indicators = to_indicator_dicts(compute_indicators(close_panel))
+
+                # 銘柄間のリターン相関（シャード実行では全銘柄がそろう結合時に計算する）
+                correlation = None
+                if shard is not None:
+                    report_path = generator.generate_shard_result(
+                        stocks_data, price_changes, shard, shard_path,
+                        indicators=indicators, close_panel=close_panel
+                    )
+                elif correlation_enabled:
+                    with metrics.stage('correlation'):
+                        correlation = analyze_correlation(
+                            close_panel,
+                            top_k=correlation_config.get('top_k', 20),
+                            matrix_max_tickers=correlation_config.get('heatmap_max_tickers', 60)
+                        )
+
+                # レポートを生成
+                if shard is None:
+                    report_path = write_report(
+                        generator, report_config, stocks_data, price_changes,
+                        indicators, correlation,
+                        comparison=self._archive_snapshot(stocks_data, price_changes)
+                    )
+
+            self._log_summary(stocks_data, price_changes)
+
+        except Exception as e:
+            logger.error(f"レポート生成中にエラーが発生しました: {str(e)}", exc_info=True)
+            if self.metrics is not None:
+                self.metrics.count('run_errors')
+
+        self._write_metrics(report_path)
+
+    def merge(self, directory: Optional[str] = None) -> None:
+        """
+        シャード実行の中間ファイルを結合して最終レポートを生成する
+
+        Args:
+            directory: 中間ファイルのディレクトリ（省略時は今日のshards/YYYYMMDD）
+        """
+        logger.info("シャードの結果を結合してレポートを生成します...")
+        report_path = None
+
+        try:
+            from price_panel import build_close_panel
+            from correlation import analyze_correlation
+            from shard import load_shard_results, shard_dir
+
+            started = time.perf_counter()
+            self._refresh()
+            metrics = self.metrics
+            metrics.reset()
+            metrics.add_stage('config_load', time.perf_counter() - started)
+            config = self.config
+            report_config = config.get('report', {})
+            directory = directory or shard_dir(report_config.get('output_dir', './reports'))
+
+            with metrics.stage('merge'):
+                merged = load_shard_results(directory, watchlist=config.get('watchlist'))
+            if merged['missing_shards']:
+                logger.warning(
+                    f"{merged['shard_count']}個中{len(merged['missing_shards'])}個のシャードの"
+                    f"中間ファイルがありません（シャード番号: {merged['missing_shards']}）。"
+                    "見つかった銘柄だけでレポートを生成します"
+                )
+            stocks_data = merged['stocks_data']
+            price_changes = merged['price_changes']
+
+            correlation = None
+            correlation_config = report_config.get('correlation', {}) or {}
+            if correlation_config.get('enabled', False):
+                with metrics.stage('correlation'):
+                    correlation = analyze_correlation(
+                        build_close_panel(stocks_data),
+                        top_k=correlation_config.get('top_k', 20),
+                        matrix_max_tickers=correlation_config.get('heatmap_max_tickers', 60)
+                    )
+
+            report_path = write_report(
+                self.generator, report_config, stocks_data, price_changes,
+                merged['indicators'], correlation,
+                chart_paths=merged['chart_paths'],
+                comparison=self._archive_snapshot(stocks_data, price_changes)
+            )
+            self._log_summary(stocks_data, price_changes)
+
+        except Exception as e:
+            logger.error(f"シャードの結合中にエラーが発生しました: {str(e)}", exc_info=True)
+            if self.metrics is not None:
+                self.metrics.count('run_errors')
+
+        self._write_metrics(report_path)
+
+    def backfill(self, weeks: int) -> None:
+        """
+        過去weeks週分の週次レポートを再生成する
+
+        価格履歴は全銘柄分を1回だけ取得し、各週の時点の価格変動・指標を一括計算してから、
+        週ごとのレポートをワーカープロセスで並列に描画します。スナップショットのアーカイブは
+        前回との比較に読むだけで、再生成した週の値は記録しません（会社情報が現在の値のため）。
+
+        Args:
+            weeks: 再生成する週数（直近の実行予定日から遡る）
+        """
+        logger.info(f"過去{weeks}週分のレポートを再生成します...")
+        report_paths = []
+
+        try:
+            from collections import deque
+            from concurrent.futures import ProcessPoolExecutor
+            from backfill import as_of_week, backfill_period, full_close_panel, render_week, report_times
+            from correlation import analyze_correlation
+            from indicators import IndicatorState
+
+            started = time.perf_counter()
+            self._refresh(with_fetcher=False)
+            metrics = self.metrics
+            metrics.reset()
+            metrics.add_stage('config_load', time.perf_counter() - started)
+            config = self.config
+            watchlist = config.get('watchlist', [])
+            report_config = config.get('report', {}) or {}
+            correlation_config = report_config.get('correlation', {}) or {}
+            schedule_config = config.get('schedule', {}) or {}
+            backfill_config = config.get('backfill', {}) or {}
+
+            if not watchlist:
+                logger.warning("ウォッチリストが空です。設定ファイルを確認してください。")
+                return
+
+            # 最も古い週にも1年分の履歴が必要なため、通常より長い期間を1回だけ取得する
+            # （価格キャッシュは通常の期間しか保持しないため使わない）
+            period = backfill_period(weeks)
+            fetcher = create_fetcher(config, metrics, history_period=period, use_price_cache=False)
+            try:
+                logger.info(f"{len(watchlist)}件の価格履歴（{period}）を取得中...")
+                with metrics.stage('fetch'):
+                    fetcher.retry_policy.start()
+                    histories = fetcher.download_histories(watchlist)
+                    missing = [ticker for ticker in watchlist if ticker not in histories]
+                    if missing:
+                        logger.warning(
+                            f"価格履歴を一括取得できなかった{len(missing)}件は過去のレポートから除きます"
+                        )
+                    # 会社情報は価格履歴がそろった銘柄だけ取得する（価格履歴は取得し直さない）
+                    stocks_data = fetcher.get_multiple_stocks(
+                        [ticker for ticker in watchlist if ticker in histories], histories=histories
+                    )
+            finally:
+                fetcher.close()
+
+            close = full_close_panel(histories)
+            del histories
+
+            times = report_times(weeks, schedule_config.get('day_of_week', 'monday'),
+                                 schedule_config.get('time', '09:00'))
+            workers = max(1, int(backfill_config.get('workers') or os.cpu_count() or 1))
+            state = IndicatorState()
+            pending = deque()
+
+            def collect() -> None:
+                report_time, future = pending.popleft()
+                try:
+                    report_paths.append(future.result())
+                except Exception as e:
+                    logger.error(f"{report_time:%Y-%m-%d} のレポート生成中にエラーが発生しました: {str(e)}")
+                    metrics.count('run_errors')
+
+            # 週ごとの計算は古い順に行い（指標の差分更新・前週との比較のため）、
+            # 描画はでき次第ワーカーに渡す。待ちの週数を抑えてメモリ使用量を一定にする
+            with ProcessPoolExecutor(max_workers=workers) as executor, metrics.stage('backfill'):
+                for report_time in times:
+                    with metrics.stage('price_changes'):
+                        week_stocks, price_changes, indicators, window = as_of_week(
+                            close, stocks_data, report_time, state
+                        )
+                    if not week_stocks:
+                        logger.warning(f"{report_time:%Y-%m-%d} より前の価格データがありません")
+                        continue
+
+                    correlation = None
+                    if correlation_config.get('enabled', False):
+                        with metrics.stage('correlation'):
+                            correlation = analyze_correlation(
+                                window,
+                                top_k=correlation_config.get('top_k', 20),
+                                matrix_max_tickers=correlation_config.get('heatmap_max_tickers', 60)
+                            )
+                    comparison = self._archive_snapshot(
+                        week_stocks, price_changes, run_date=report_time.strftime('%Y-%m-%d'),
+                        read_only=True
+                    )
+
+                    pending.append((report_time, executor.submit(
+                        render_week, config, report_time, week_stocks, price_changes,
+                        indicators, correlation, comparison
+                    )))
+                    if len(pending) >= workers * 2:
+                        collect()
+                while pending:
+                    collect()
+
+            report_paths = [path for path in report_paths if path is not None]
+            logger.info(f"{len(report_paths)}/{len(times)}週分のレポートを生成しました")
+            for path in report_paths:
+                logger.info(f"  {path}")
+
+        except Exception as e:
+            logger.error(f"レポートの再生成中にエラーが発生しました: {str(e)}", exc_info=True)
+            if self.metrics is not None:
+                self.metrics.count('run_errors')
+
+        self._write_metrics(None)
+
+    def _archive_snapshot(self, stocks_data: List[Dict], price_changes: List[Dict],
+                          run_date: Optional[str] = None, read_only: bool = False) -> Optional[Dict]:
+        """
+        今回の銘柄指標をアーカイブに追記し、前回の実行との比較を返す
+
+        アーカイブへの書き込みに失敗してもレポートの生成は続けます。
+
+        Args:
+            run_date: 実行日（YYYY-MM-DD、省略時は今日）
+            read_only: 比較だけを行い、アーカイブには書き込まない（過去レポートの再生成用）。
+                会社情報（時価総額・PER・配当利回り）は現在の値しか無いため、比較からも除く
+
+        Returns:
+            SnapshotArchive.compare()の結果（アーカイブが無効・比較できる実行が無い場合はNone）
+        """
+        if self.archive is None:
+            return None
+        from snapshot_archive import METADATA_COLUMNS, snapshot_frame
+
+        archive_config = self.config.get('archive', {}) or {}
+        try:
+            with self.metrics.stage('archive'):
+                snapshot = snapshot_frame(stocks_data, price_changes)
+                if read_only:
+                    snapshot[METADATA_COLUMNS] = float('nan')
+                comparison = self.archive.compare(
+                    snapshot, run_date, min_days=archive_config.get('compare_days', 7)
+                )
+                if not read_only:
+                    self.archive.record(snapshot, run_date)
+        except Exception as e:
+            logger.error(f"スナップショットの保存中にエラーが発生しました: {str(e)}")
+            self.metrics.count('archive_errors')
+            return None
+        return comparison
+
+    @staticmethod
+    def _log_summary(stocks_data: List[Dict], price_changes: List[Dict]) -> None:
+        """サマリーをログに出力する"""
+        logger.info("=" * 60)
+        logger.info("レポートサマリー")
+        logger.info("=" * 60)
+        for stock_data, changes in zip(stocks_data, price_changes):
+            if 'error' not in stock_data:
+                ticker = stock_data['ticker']
+                company_name = stock_data.get('company_name', 'N/A')
+                current_price = stock_data.get('current_price', 'N/A')
+
+                week_change = changes.get('week_change', {})
+                week_pct = week_change.get('percentage', None)
+
+                logger.info(f"{ticker} ({company_name}): {current_price}")
+                if week_pct is not None:
+                    logger.info(f"  1週間変動: {week_pct:+.2f}%")
+        logger.info("=" * 60)
+
+    def _write_metrics(self, report_path: Optional[str]) -> None:
+        """メトリクスを書き出す（失敗した場合も原因を追えるように常に呼び出す）"""
+        if self.metrics is not None and self.metrics.enabled:
+            try:
+                output_dir = self.config.get('report', {}).get('output_dir', './reports')
+                paths = self.metrics.write(report_path, output_dir)
+                logger.info(f"メトリクスを出力しました: {', '.join(paths)}")
+            except Exception as e:
+                logger.error(f"メトリクスの出力中にエラーが発生しました: {str(e)}")
+
+    def close(self) -> None:
+        """保持しているキャッシュやワーカープロセスを解放する"""
+        if self.fetcher is not None:
+            self.fetcher.close()
+            self.fetcher = None
+        if self.generator is not None:
+            self.generator.close()
+            self.generator = None
+        if self.archive is not None:
+            self.archive.close()
+            self.archive = None
@@ -0,0 +1,175 @@
+"""
+リトライ・サーキットブレーカーモジュール
+yfinanceの呼び出しが一時的に失敗したとき（レート制限・通信エラーなど）に、
+ジッター付きの指数バックオフで再試行します
+
+サーキットブレーカーは直近の呼び出しのエラー率が高くなると、一定時間すべての
+ワーカーの呼び出しを止め、制限中のエンドポイントにリクエストを送り続けないようにします。
+"""
+import random
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+import logging
+
+from metrics import NULL_METRICS, RunMetrics
+
+logger = logging.getLogger(__name__)
+
+# 再試行しても結果が変わらない例外（存在しないティッカー・引数の誤りなど）
+# ValueErrorは含めない。制限中や空の応答で発生するJSONDecodeErrorがValueErrorのサブクラスのため
+NON_RETRYABLE_ERRORS = (KeyError, TypeError, AttributeError, IndexError)
+NON_RETRYABLE_ERROR_NAMES = {
+    'YFTickerMissingError', 'YFPricesMissingError', 'YFInvalidPeriodError', 'YFTzMissingError',
+}
+
+
+def is_retryable(error: Exception) -> bool:
+    """再試行する価値のある例外か（レート制限・通信エラーなど）"""
+    if type(error).__name__ in NON_RETRYABLE_ERROR_NAMES:
+        return False
+    return not isinstance(error, NON_RETRYABLE_ERRORS)
+
+
+class CircuitBreaker:
+    """直近の呼び出しのエラー率が高いときに全ワーカーの呼び出しを一時停止する"""
+
+    def __init__(self, window: int = 20, error_rate: float = 0.5, cooldown_seconds: float = 30.0):
+        """
+        Args:
+            window: エラー率を計算する直近の呼び出し数
+            error_rate: 停止するエラー率（0〜1）
+            cooldown_seconds: 停止する秒数
+        """
+        self.window = max(1, int(window))
+        self.error_rate = error_rate
+        self.cooldown_seconds = cooldown_seconds
+        self._results = deque(maxlen=self.window)
+        self._open_until = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> float:
+        """
+        停止中であれば再開されるまで待機する
+
+        Returns:
+            待機した秒数
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                remaining = self._open_until - time.monotonic()
+            if remaining <= 0:
+                return waited
+            time.sleep(remaining)
+            waited += remaining
+
+    def record(self, ok: bool) -> bool:
+        """
+        呼び出しの結果を記録する
+
+        Returns:
+            この記録によって停止状態になった場合はTrue
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now < self._open_until:
+                # 停止前に始まった呼び出しの結果は数えない
+                return False
+            self._results.append(ok)
+            if len(self._results) < self.window:
+                return False
+            failures = self._results.count(False)
+            if failures / len(self._results) < self.error_rate:
+                return False
+            self._open_until = now + self.cooldown_seconds
+            self._results.clear()
+        logger.warning(
+            f"エラー率が{failures}/{self.window}件に達したため、"
+            f"{self.cooldown_seconds:.0f}秒間すべての取得を停止します"
+        )
+        return True
+
+
+class RetryPolicy:
+    """ジッター付き指数バックオフで呼び出しを再試行するクラス（複数スレッドで共有できる）"""
+
+    def __init__(self, max_attempts: int = 1, base_delay: float = 1.0, max_delay: float = 30.0,
+                 time_budget_seconds: Optional[float] = None,
+                 breaker: Optional[CircuitBreaker] = None, retry_failed: bool = False,
+                 metrics: Optional[RunMetrics] = None):
+        """
+        Args:
+            max_attempts: 1回の呼び出しの最大試行回数（1で再試行しない）
+            base_delay: 1回目の再試行までの待ち時間の上限（秒）。試行ごとに2倍になる
+            max_delay: 待ち時間の上限（秒）
+            time_budget_seconds: start()からの再試行に使える時間（Noneで無制限）
+            breaker: サーキットブレーカー（Noneで使わない）
+            retry_failed: 取得全体の最後に、失敗したティッカーだけを取得し直すか
+            metrics: 再試行回数などの記録先
+        """
+        self.max_attempts = max(1, int(max_attempts))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.time_budget_seconds = time_budget_seconds
+        self.breaker = breaker
+        self.retry_failed = retry_failed
+        self.metrics = metrics or NULL_METRICS
+        self._deadline = None
+
+    def start(self) -> None:
+        """再試行の時間予算を開始する（get_multiple_stocks()など、取得の入口ごとに呼び出す）"""
+        if self.time_budget_seconds is None:
+            self._deadline = None
+        else:
+            self._deadline = time.monotonic() + self.time_budget_seconds
+
+    def remaining(self) -> Optional[float]:
+        """時間予算の残り秒数（無制限の場合はNone）"""
+        if self._deadline is None:
+            return None
+        return max(0.0, self._deadline - time.monotonic())
+
+    def call(self, func: Callable, description: str = ""):
+        """
+        funcを呼び出し、一時的なエラーであれば再試行する
+
+        待ち時間は 0〜min(max_delay, base_delay * 2^(試行回数-1)) の一様乱数で、
+        時間予算の残りを超える場合は再試行せずに例外を送出します。
+
+        Args:
+            func: 引数なしで呼び出す関数
+            description: ログに出す呼び出しの説明
+
+        Returns:
+            funcの戻り値
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            if self.breaker is not None:
+                self.breaker.wait()
+            try:
+                result = func()
+            except Exception as e:
+                retryable = is_retryable(e)
+                if self.breaker is not None and retryable and self.breaker.record(False):
+                    self.metrics.count('circuit_opens')
+                if not retryable or attempt >= self.max_attempts:
+                    raise
+
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+                remaining = self.remaining()
+                if remaining is not None and delay >= remaining:
+                    raise
+                logger.warning(
+                    f"{description}の呼び出しに失敗しました（{attempt}回目）。"
+                    f"{delay:.1f}秒後に再試行します: {str(e)}"
+                )
+                self.metrics.count('retries')
+                time.sleep(delay)
+            else:
+                if self.breaker is not None:
+                    self.breaker.record(True)
+                return result
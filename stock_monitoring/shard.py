@@ -0,0 +1,191 @@
+"""
+シャード実行モジュール
+ウォッチリストを安定したハッシュでN個のシャードに分け、シャードごとの取得・計算・チャート描画の
+結果を中間ファイル（JSON）に書き出し、それらを結合して最終レポートの入力に戻します
+
+シャードの割り当てはティッカー名のハッシュだけで決まるため、複数のプロセスやマシンで
+`python main.py --shard i/N` を実行しても、各ティッカーはいずれか1つのシャードで処理されます。
+ワーカー間で共有するのは出力先のファイルシステムだけです。
+"""
+import glob
+import hashlib
+import json
+import os
+import re
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+from stock_record import FIELD_KEYS, StockRecord
+
+SHARD_FILE_PATTERN = re.compile(r"shard_(\d+)_of_(\d+)\.json$")
+
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """
+    "i/N" 形式のシャード指定を解析する（iは0始まり）
+
+    Returns:
+        (シャード番号, シャード数)
+    """
+    match = re.fullmatch(r"\s*(\d+)\s*/\s*(\d+)\s*", spec)
+    if match is None:
+        raise ValueError(f"シャードの指定は i/N の形式で指定してください: {spec}")
+    index, count = int(match.group(1)), int(match.group(2))
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"シャード番号は 0 以上 {count} 未満で指定してください: {spec}")
+    return index, count
+
+
+def shard_of(ticker: str, count: int) -> int:
+    """
+    ティッカーが属するシャード番号を返す
+
+    Pythonのhash()は実行ごとに変わるため、プロセスやマシンをまたいでも同じ値になるMD5を使います。
+    """
+    digest = hashlib.md5(ticker.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % count
+
+
+def select_shard(watchlist: List[str], index: int, count: int) -> List[str]:
+    """ウォッチリストからシャードindexに属するティッカーを取り出す（順序は保つ）"""
+    return [ticker for ticker in watchlist if shard_of(ticker, count) == index]
+
+
+def shard_dir(output_dir: str, run_date: Optional[str] = None) -> str:
+    """
+    中間ファイルの置き場所
+
+    Args:
+        output_dir: レポートの出力先ディレクトリ
+        run_date: 実行日（YYYYMMDD、省略時は今日）。同じ日のワーカーは同じ場所に書き出す
+    """
+    return os.path.join(output_dir, "shards", run_date or datetime.now().strftime('%Y%m%d'))
+
+
+def shard_filename(index: int, count: int) -> str:
+    """シャードの中間ファイル名"""
+    width = len(str(count - 1))
+    return f"shard_{index:0{width}d}_of_{count}.json"
+
+
+def _clean(value):
+    """JSONに書き出せない値（NaN・numpyの数値）を変換する"""
+    if isinstance(value, (np.floating, float)):
+        return None if np.isnan(value) else float(value)
+    if isinstance(value, np.integer):
+        return int(value)
+    return value
+
+
+def write_shard_result(path: str, shard: Tuple[int, int], stocks_data: List[Dict],
+                       price_changes: List[Dict], chart_paths: Dict[str, str],
+                       indicators: Dict[str, Dict], close_panel: pd.DataFrame) -> str:
+    """
+    シャードの結果を中間ファイルに書き出す
+
+    書きかけのファイルを結合しないよう、一時ファイルに書いてから置き換えます。
+
+    Args:
+        path: 中間ファイルのパス
+        shard: (シャード番号, シャード数)
+        stocks_data: 株価データのリスト
+        price_changes: 価格変動データのリスト
+        chart_paths: チャートの相対パスまたは埋め込み用のSVGの辞書（出力先ディレクトリからの相対パス）
+        indicators: テクニカル指標の辞書
+        close_panel: 日付 × ティッカーの終値パネル（結合後の相関・履歴の出力に使う）
+
+    Returns:
+        書き出したファイルのパス
+    """
+    stocks = []
+    for stock_data, changes in zip(stocks_data, price_changes):
+        ticker = stock_data.get('ticker')
+        if 'error' in stock_data:
+            stocks.append({'fields': {'ticker': ticker}, 'error': stock_data['error']})
+            continue
+        stocks.append({
+            'fields': {key: _clean(stock_data.get(key)) for key in FIELD_KEYS},
+            'changes': {name: {k: _clean(v) for k, v in change.items()}
+                        for name, change in changes.items()},
+            'indicators': {k: _clean(v) for k, v in indicators.get(ticker, {}).items()},
+            'chart': chart_paths.get(ticker),
+        })
+
+    result = {
+        'shard': {'index': shard[0], 'count': shard[1]},
+        'created_at': datetime.now().isoformat(),
+        'stocks': stocks,
+        'close': {
+            'dates': [date.strftime('%Y-%m-%d') for date in close_panel.index],
+            'values': {ticker: [_clean(v) for v in close_panel[ticker].to_numpy()]
+                       for ticker in close_panel.columns},
+        },
+    }
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_shard_results(directory: str, watchlist: Optional[List[str]] = None) -> Dict:
+    """
+    ディレクトリ内のシャードの中間ファイルを読み込んで結合する
+
+    株価データは終値から組み立て直したStockRecordになるため、結合後も
+    build_close_panel()やExcel・CSVの価格履歴の出力にそのまま使えます。
+
+    Args:
+        directory: 中間ファイルのディレクトリ（shard_dir()）
+        watchlist: 銘柄の並び順（省略時は中間ファイルの順）
+
+    Returns:
+        stocks_data / price_changes / chart_paths / indicators / shard_count /
+        missing_shards（見つからなかったシャード番号）の辞書
+    """
+    shard_files = {}
+    count = None
+    for path in sorted(glob.glob(os.path.join(directory, "shard_*_of_*.json"))):
+        match = SHARD_FILE_PATTERN.search(path)
+        if match is None:
+            continue
+        index, file_count = int(match.group(1)), int(match.group(2))
+        if count is not None and file_count != count:
+            raise ValueError(f"シャード数の異なる中間ファイルが混在しています: {directory}")
+        count = file_count
+        shard_files[index] = path
+    if count is None:
+        raise FileNotFoundError(f"シャードの中間ファイルがありません: {directory}")
+
+    records = {}
+    for index in sorted(shard_files):
+        with open(shard_files[index], 'r', encoding='utf-8') as f:
+            result = json.load(f)
+        close = result['close']
+        panel = pd.DataFrame(close['values'], index=pd.to_datetime(close['dates']), dtype=float)
+
+        for stock in result['stocks']:
+            ticker = stock['fields']['ticker']
+            if 'error' in stock:
+                records[ticker] = ({'ticker': ticker, 'error': stock['error']}, {}, {}, None)
+                continue
+            dates, values = None, None
+            if ticker in panel.columns:
+                series = panel[ticker].dropna()
+                dates, values = series.index, series.to_numpy(dtype=np.float32)
+            record = StockRecord(stock['fields'], dates, values)
+            records[ticker] = (record, stock['changes'], stock['indicators'], stock['chart'])
+
+    order = [ticker for ticker in watchlist if ticker in records] if watchlist else list(records)
+    return {
+        'stocks_data': [records[ticker][0] for ticker in order],
+        'price_changes': [records[ticker][1] for ticker in order],
+        'indicators': {ticker: records[ticker][2] for ticker in order if records[ticker][2]},
+        'chart_paths': {ticker: records[ticker][3] for ticker in order if records[ticker][3]},
+        'shard_count': count,
+        'missing_shards': [index for index in range(count) if index not in shard_files],
+    }
@@ -0,0 +1,242 @@
+"""
+スナップショットアーカイブモジュール
+実行ごとの銘柄指標（価格・変動率・時価総額・PER・配当利回り・順位）をSQLiteに蓄積し、
+前回レポートとの比較や複数回の実行にまたがる推移の集計に利用します
+
+スナップショットは (ticker, run_date) を主キーとするテーブルに1実行1行ずつ追記し、
+同じ日に再実行した場合は上書きします。run_date にも索引を張るため、
+特定の日の全銘柄・特定の銘柄の全期間のどちらの読み出しも索引だけで済みます。
+"""
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 保存する指標（列名）
+SNAPSHOT_COLUMNS = [
+    'price', 'week_change_pct', 'month_change_pct', 'year_change_pct',
+    'market_cap', 'pe_ratio', 'dividend_yield', 'week_rank',
+]
+
+# 会社情報から取る指標（過去の値を取得できないため、再生成したレポートでは比較しない）
+METADATA_COLUMNS = ['market_cap', 'pe_ratio', 'dividend_yield']
+
+# 1回の問い合わせでティッカーを条件に指定する上限
+MAX_SQL_VARIABLES = 500
+
+
+def snapshot_frame(stocks_data: List[Dict], price_changes: List[Dict]) -> pd.DataFrame:
+    """
+    取得結果からスナップショットの行を作成する
+
+    week_rank は1週間変動率の高い順の順位（1が最上位、同率は同順位）です。
+
+    Returns:
+        ティッカーをインデックスとし、SNAPSHOT_COLUMNSの列を持つDataFrame
+    """
+    rows = {}
+    for stock_data, changes in zip(stocks_data, price_changes):
+        if 'error' in stock_data:
+            continue
+        rows[stock_data['ticker']] = {
+            'price': stock_data.get('current_price'),
+            'week_change_pct': changes.get('week_change', {}).get('percentage'),
+            'month_change_pct': changes.get('month_change', {}).get('percentage'),
+            'year_change_pct': changes.get('year_change', {}).get('percentage'),
+            'market_cap': stock_data.get('market_cap'),
+            'pe_ratio': stock_data.get('pe_ratio'),
+            'dividend_yield': stock_data.get('dividend_yield'),
+        }
+    frame = pd.DataFrame.from_dict(rows, orient='index', dtype=float,
+                                   columns=SNAPSHOT_COLUMNS[:-1])
+    frame['week_rank'] = frame['week_change_pct'].rank(ascending=False, method='min')
+    return frame
+
+
+class SnapshotArchive:
+    """実行ごとの銘柄指標のアーカイブ（SQLite）"""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: SQLiteファイルのパス
+        """
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        columns = ",\n".join(f"                {name} REAL" for name in SNAPSHOT_COLUMNS)
+        self._conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS snapshots (
+                ticker TEXT NOT NULL,
+                run_date TEXT NOT NULL,
+{columns},
+                recorded_at TEXT NOT NULL,
+                PRIMARY KEY (ticker, run_date)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS snapshots_run_date ON snapshots (run_date, ticker);
+        """)
+        self._conn.commit()
+
+    def record(self, snapshot: pd.DataFrame, run_date: Optional[str] = None) -> int:
+        """
+        スナップショットを保存する（同じ日の同じティッカーは上書き）
+
+        Args:
+            snapshot: snapshot_frame()の結果
+            run_date: 実行日（YYYY-MM-DD、省略時は今日）
+
+        Returns:
+            保存した行数
+        """
+        run_date = run_date or datetime.now().strftime('%Y-%m-%d')
+        recorded_at = datetime.now().isoformat()
+        values = snapshot.reindex(columns=SNAPSHOT_COLUMNS).astype(object)
+        values = values.where(values.notna(), None)
+        rows = [
+            (ticker, run_date, *row, recorded_at)
+            for ticker, row in zip(values.index, values.itertuples(index=False, name=None))
+        ]
+        placeholders = ", ".join("?" * (len(SNAPSHOT_COLUMNS) + 3))
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO snapshots "
+                f"(ticker, run_date, {', '.join(SNAPSHOT_COLUMNS)}, recorded_at) "
+                f"VALUES ({placeholders})", rows
+            )
+        return len(rows)
+
+    def run_dates(self) -> List[str]:
+        """保存済みの実行日の一覧（古い順）"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT run_date FROM snapshots ORDER BY run_date"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def previous_run_date(self, run_date: str, min_days: int = 7) -> Optional[str]:
+        """
+        比較対象の実行日（run_dateのmin_days日以上前で最も新しい実行日）
+
+        Returns:
+            実行日（該当する実行が無い場合はNone）
+        """
+        cutoff = (pd.Timestamp(run_date) - pd.Timedelta(days=min_days)).strftime('%Y-%m-%d')
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MAX(run_date) FROM snapshots WHERE run_date <= ?", (cutoff,)
+            ).fetchone()
+        return row[0]
+
+    def load(self, run_date: str, tickers: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        実行日のスナップショットを読み込む
+
+        Args:
+            run_date: 実行日（YYYY-MM-DD）
+            tickers: 読み込むティッカー（省略時は全銘柄）
+
+        Returns:
+            ティッカーをインデックスとし、SNAPSHOT_COLUMNSの列を持つDataFrame
+        """
+        with self._lock:
+            frame = pd.read_sql_query(
+                f"SELECT ticker, {', '.join(SNAPSHOT_COLUMNS)} FROM snapshots "
+                "WHERE run_date = ?", self._conn, params=(run_date,), index_col='ticker'
+            )
+        if tickers is not None:
+            frame = frame.reindex(tickers).dropna(how='all')
+        return frame.astype(float)
+
+    def compare(self, current: pd.DataFrame, run_date: Optional[str] = None,
+                min_days: int = 7) -> Optional[Dict]:
+        """
+        前回の実行とのスナップショットの差分を計算する
+
+        Args:
+            current: 今回のsnapshot_frame()の結果
+            run_date: 今回の実行日（YYYY-MM-DD、省略時は今日）
+            min_days: 比較対象にする実行の最小経過日数（7で前週比）
+
+        Returns:
+            previous_date / rows の辞書（比較できる実行が無い場合はNone）。
+            rowsは今回の順位順で、各行は ticker / price_change_pct / market_cap_change_pct /
+            pe_change / dividend_yield_change / rank / previous_rank / rank_change を持つ
+        """
+        run_date = run_date or datetime.now().strftime('%Y-%m-%d')
+        previous_date = self.previous_run_date(run_date, min_days)
+        if previous_date is None or current.empty:
+            return None
+        previous = self.load(previous_date).reindex(current.index)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            deltas = pd.DataFrame({
+                'price_change_pct': (current['price'] / previous['price'] - 1) * 100,
+                'market_cap_change_pct': (current['market_cap'] / previous['market_cap'] - 1) * 100,
+                'pe_change': current['pe_ratio'] - previous['pe_ratio'],
+                'dividend_yield_change': (current['dividend_yield'] - previous['dividend_yield']) * 100,
+                'rank': current['week_rank'],
+                'previous_rank': previous['week_rank'],
+                # 順位が上がった場合に正になる
+                'rank_change': previous['week_rank'] - current['week_rank'],
+            }, index=current.index)
+        deltas = deltas.replace([np.inf, -np.inf], np.nan).sort_values('rank', na_position='last')
+
+        rows = []
+        for ticker, row in deltas.to_dict(orient='index').items():
+            values = {name: (None if pd.isna(value) else float(value)) for name, value in row.items()}
+            for name in ('rank', 'previous_rank', 'rank_change'):
+                if values[name] is not None:
+                    values[name] = int(values[name])
+            rows.append({'ticker': ticker, **values})
+        return {'previous_date': previous_date, 'rows': rows}
+
+    def trend(self, metric: str = 'price', tickers: Optional[List[str]] = None,
+              since: Optional[str] = None, until: Optional[str] = None) -> pd.DataFrame:
+        """
+        複数回の実行にまたがる指標の推移を読み出す
+
+        Args:
+            metric: SNAPSHOT_COLUMNSのいずれか
+            tickers: 対象のティッカー（省略時は全銘柄）
+            since: この実行日以降（YYYY-MM-DD）
+            until: この実行日以前（YYYY-MM-DD）
+
+        Returns:
+            実行日 × ティッカーのDataFrame
+        """
+        if metric not in SNAPSHOT_COLUMNS:
+            raise ValueError(f"未対応の指標です: {metric}")
+
+        conditions, params = [], []
+        if since is not None:
+            conditions.append("run_date >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("run_date <= ?")
+            params.append(until)
+        # SQLiteの変数の上限を超えないよう、銘柄数が多い場合は読み出し後に絞り込む
+        if tickers and len(tickers) <= MAX_SQL_VARIABLES:
+            conditions.append(f"ticker IN ({', '.join('?' * len(tickers))})")
+            params.extend(tickers)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        with self._lock:
+            frame = pd.read_sql_query(
+                f"SELECT run_date, ticker, {metric} AS value FROM snapshots {where}",
+                self._conn, params=params
+            )
+        panel = frame.pivot(index='run_date', columns='ticker', values='value').sort_index()
+        panel.index = pd.to_datetime(panel.index)
+        return panel.reindex(columns=tickers) if tickers else panel
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
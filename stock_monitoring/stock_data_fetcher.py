@@ -4,48 +4,138 @@ yfinanceを使用して株価データを取得します
 """
 import yfinance as yf
 import pandas as pd
+import numpy as np
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from functools import partial
 from typing import Dict, List, Optional
 import logging
+from rate_limiter import TokenBucket
+from price_cache import PriceCache, period_start
+from metadata_cache import MetadataCache
+from metrics import NULL_METRICS, RunMetrics
+from resilience import RetryPolicy
+from stock_record import IndexPool, StockRecord
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# レポートで使用する Ticker.info の項目
+INFO_FIELDS = (
+    'longName', 'shortName', 'sector', 'industry', 'currency',
+    'marketCap', 'trailingPE', 'dividendYield',
+    'fiftyTwoWeekHigh', 'fiftyTwoWeekLow',
+    'longBusinessSummary', 'website', 'fullTimeEmployees',
+)
+
 
 class StockDataFetcher:
     """株価データを取得するクラス"""
     
-    def __init__(self):
-        self.cache = {}
+    def __init__(self, history_period: str = "1y", max_workers: int = 1,
+                 requests_per_second: float = 0, burst: Optional[int] = None,
+                 mode: str = "ticker", bulk_chunk_size: int = 100,
+                 price_cache: Optional[PriceCache] = None, overlap_days: int = 7,
+                 metadata_cache: Optional[MetadataCache] = None,
+                 metrics: Optional[RunMetrics] = None,
+                 retry_policy: Optional[RetryPolicy] = None):
+        """
+        Args:
+            history_period: 1回のhistory()呼び出しで取得する期間（例: 1y, 2y）
+            max_workers: 同時に取得するティッカー数（1で逐次取得）
+            requests_per_second: yfinanceへの1秒あたりの最大リクエスト数（0で無制限）
+            burst: 連続して送信できるリクエスト数の上限
+            mode: 価格履歴の取得方法（ticker: ティッカーごと, bulk: 一括ダウンロード）
+            bulk_chunk_size: bulkモードで1回のダウンロードに含めるティッカー数
+            price_cache: 日足データの永続キャッシュ（Noneで毎回全期間を取得）
+            overlap_days: 差分取得時にキャッシュと重複させる日数（調整の検出用）
+            metadata_cache: 会社情報のキャッシュ（Noneで毎回Ticker.infoを取得）
+            metrics: 取得時間・エラー数の記録先（Noneで記録しない）
+            retry_policy: yfinanceの呼び出しの再試行・サーキットブレーカー（Noneで再試行しない）
+        """
+        if mode not in ("ticker", "bulk"):
+            raise ValueError(f"未対応の取得モードです: {mode}")
+        
+        self.price_cache = price_cache
+        self.overlap_days = overlap_days
+        self.metadata_cache = metadata_cache
+        self.index_pool = IndexPool()
+        self.history_period = history_period
+        self.max_workers = max(1, int(max_workers))
+        self.rate_limiter = TokenBucket(requests_per_second, burst)
+        self.mode = mode
+        self.bulk_chunk_size = max(1, int(bulk_chunk_size))
+        self.metrics = metrics or NULL_METRICS
+        self.retry_policy = retry_policy or RetryPolicy()
+        # get_latest_prices()で前回までに取得した最新の分足の時刻（UTC）
+        self._last_bar_time = None
+    
+    @staticmethod
+    def split_history(history: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+        """
+        1回で取得した価格履歴から各期間のデータを切り出す
+        
+        period="1d"/"5d"/"1mo" で個別に取得した場合と同じ範囲になるよう、
+        直近の営業日を基準にスライスします（コピーは作りません）。
+        
+        Args:
+            history: stock.history()で取得した価格履歴
+            
+        Returns:
+            current_data / weekly_data / monthly_data / yearly_data をキーとする辞書
+        """
+        if history.empty:
+            return {
+                'current_data': history,
+                'weekly_data': history,
+                'monthly_data': history,
+                'yearly_data': history,
+            }
+        
+        # 1ヶ月前・1年前の日付以降をそれぞれ月次・年次データとする
+        last_date = history.index[-1]
+        month_start = last_date - pd.DateOffset(months=1)
+        year_start = last_date - pd.DateOffset(years=1)
+        return {
+            'current_data': history.iloc[-1:],
+            'weekly_data': history.iloc[-5:],
+            'monthly_data': history.loc[history.index >= month_start],
+            'yearly_data': history.loc[history.index >= year_start],
+        }
     
-    def get_stock_info(self, ticker: str) -> Dict:
+    def get_stock_info(self, ticker: str, history: Optional[pd.DataFrame] = None) -> Dict:
         """
         指定されたティッカーシンボルの会社情報と現在の株価を取得
         
         Args:
             ticker: ティッカーシンボル（例: AAPL）
+            history: 取得済みの価格履歴（省略時はここで取得する）
             
         Returns:
-            会社情報と株価データの辞書
+            会社情報と株価データのStockRecord（辞書と同じキーで参照可能）。
+            エラー時は ticker / error を持つ辞書
         """
+        started = time.perf_counter()
         try:
             stock = yf.Ticker(ticker)
-            info = stock.info
+            info = self._get_info(ticker, stock)
             
-            # 現在の株価データを取得
-            current_data = stock.history(period="1d")
-            current_price = current_data['Close'].iloc[-1] if not current_data.empty else None
+            # 価格履歴は1回だけ取得し、短い期間はそこから切り出す
+            if history is None:
+                history = self._fetch_history(ticker, stock)
+            windows = self.split_history(history)
             
-            # 過去1週間のデータを取得
-            weekly_data = stock.history(period="5d")
-            
-            # 過去1ヶ月のデータを取得
-            monthly_data = stock.history(period="1mo")
+            # 現在の株価データ
+            current_data = windows['current_data']
+            current_price = current_data['Close'].iloc[-1] if not current_data.empty else None
             
-            # 過去1年のデータを取得
-            yearly_data = stock.history(period="1y")
+            # 過去1年のデータ（1y取得時はYahooの範囲をそのまま使う）
+            if self.history_period == "1y":
+                windows['yearly_data'] = history
             
-            result = {
+            fields = {
                 'ticker': ticker,
                 'company_name': info.get('longName', info.get('shortName', 'N/A')),
                 'sector': info.get('sector', 'N/A'),
@@ -60,40 +150,378 @@ class StockDataFetcher:
                 'description': info.get('longBusinessSummary', 'N/A'),
                 'website': info.get('website', 'N/A'),
                 'employees': info.get('fullTimeEmployees', None),
-                'current_data': current_data,
-                'weekly_data': weekly_data,
-                'monthly_data': monthly_data,
-                'yearly_data': yearly_data,
                 'fetched_at': datetime.now().isoformat()
             }
             
+            # 週次・月次・年次のデータは終値1本（float32）へのオフセットとして持つ
+            result = StockRecord.from_history(fields, windows, self.index_pool)
+            
             logger.info(f"{ticker} のデータを取得しました")
+            self.metrics.observe_fetch(ticker, time.perf_counter() - started)
             return result
             
         except Exception as e:
             logger.error(f"{ticker} のデータ取得中にエラーが発生しました: {str(e)}")
+            self.metrics.observe_fetch(ticker, time.perf_counter() - started, ok=False)
             return {
                 'ticker': ticker,
                 'error': str(e),
                 'fetched_at': datetime.now().isoformat()
             }
     
-    def get_multiple_stocks(self, tickers: List[str]) -> List[Dict]:
+    def get_multiple_stocks(self, tickers: List[str],
+                            histories: Optional[Dict[str, pd.DataFrame]] = None) -> List[Dict]:
         """
         複数のティッカーシンボルのデータを取得
         
+        max_workers が2以上の場合はスレッドプールで並行取得します。
+        mode が bulk の場合、価格履歴は download_histories() でまとめて取得し、
+        会社情報のみティッカーごとに取得します。
+        retry_policy.retry_failed が有効な場合、失敗したティッカーは最後にもう一度取得します。
+        結果は入力と同じ順序で返されます。
+        
         Args:
             tickers: ティッカーシンボルのリスト
+            histories: 取得済みの価格履歴（含まれるティッカーは価格履歴を取得しない）
             
         Returns:
             各株の情報のリスト
         """
-        results = []
-        for ticker in tickers:
-            stock_info = self.get_stock_info(ticker)
-            results.append(stock_info)
+        # 日付インデックスの共有は1回の取得の中だけで行う
+        self.index_pool.clear()
+        self.retry_policy.start()
+        
+        if histories is not None:
+            results = self._map(
+                lambda ticker: self.get_stock_info(ticker, history=histories.get(ticker)),
+                tickers
+            )
+        elif self.mode == "bulk":
+            histories = self.download_histories(tickers)
+            results = self._map(
+                lambda ticker: self.get_stock_info(ticker, history=histories.get(ticker)),
+                tickers
+            )
+        else:
+            results = self._map(self.get_stock_info, tickers)
+        
+        # 失敗したティッカーだけを最後にもう一度取得する（時間予算が残っている場合）
+        failed = [i for i, result in enumerate(results) if 'error' in result]
+        if failed and self.retry_policy.retry_failed and self.retry_policy.remaining() != 0:
+            logger.info(f"取得に失敗した{len(failed)}件を再取得します")
+            # 取得済みの価格履歴があればそれを使い、会社情報だけを取得し直す
+            retried = self._map(
+                lambda ticker: self.get_stock_info(
+                    ticker, history=histories.get(ticker) if histories is not None else None
+                ),
+                [tickers[i] for i in failed]
+            )
+            for i, result in zip(failed, retried):
+                results[i] = result
+            recovered = sum(1 for result in retried if 'error' not in result)
+            logger.info(f"{recovered}/{len(failed)}件を再取得しました")
+        
+        if self.metadata_cache is not None:
+            self.metadata_cache.save()
         return results
     
+    def close(self) -> None:
+        """キャッシュを保存して閉じる"""
+        if self.metadata_cache is not None:
+            self.metadata_cache.save()
+        if self.price_cache is not None:
+            self.price_cache.close()
+    
+    def _get_info(self, ticker: str, stock) -> Dict:
+        """
+        会社情報を取得する（metadata_cacheが有効期限内ならTicker.infoを呼ばない）
+        
+        Args:
+            ticker: ティッカーシンボル
+            stock: yf.Tickerオブジェクト
+            
+        Returns:
+            Ticker.info（またはそのキャッシュ）の辞書
+        """
+        if self.metadata_cache is not None:
+            cached = self.metadata_cache.get(ticker, INFO_FIELDS)
+            if cached is not None:
+                # キャッシュにはinfoに無かった項目もNoneで入っているため除く
+                return {field: value for field, value in cached.items() if value is not None}
+        
+        info = self._request(lambda: stock.info, f"{ticker} の会社情報")
+        
+        if self.metadata_cache is not None:
+            self.metadata_cache.put(ticker, info, INFO_FIELDS)
+        return info
+    
+    def download_histories(self, tickers: List[str]) -> Dict[str, pd.DataFrame]:
+        """
+        複数ティッカーの価格履歴をまとめてダウンロードする
+        
+        yf.download() をbulk_chunk_size件ずつ呼び出し、横持ちの結果を
+        ティッカーごとのDataFrameに分割します。price_cacheがある場合は
+        最終保存日以降の差分だけを開始日ごとにまとめて取得します。
+        ダウンロードに失敗したティッカーは結果に含まれません（個別取得にフォールバック）。
+        
+        Args:
+            tickers: ティッカーシンボルのリスト
+            
+        Returns:
+            ティッカー -> 価格履歴の辞書
+        """
+        tickers = list(dict.fromkeys(tickers))
+        if self.price_cache is None:
+            histories = self._download(tickers, period=self.history_period)
+            logger.info(f"{len(histories)}/{len(tickers)}件の価格履歴を一括取得しました")
+            return histories
+        
+        histories = {}
+        cached_frames = {}
+        full_fetch = []
+        delta_groups = defaultdict(list)
+        
+        for ticker in tickers:
+            cached = self.price_cache.load(ticker)
+            if cached is None:
+                full_fetch.append(ticker)
+            elif self.price_cache.is_fresh(ticker):
+                histories[ticker] = self._trim_history(cached)
+            else:
+                cached_frames[ticker] = cached
+                delta_groups[self._delta_start(cached)].append(ticker)
+        
+        # 差分取得（開始日が同じティッカーをまとめる）
+        for start, group in delta_groups.items():
+            deltas = self._download(group, start=start)
+            for ticker in group:
+                merged = None
+                if ticker in deltas:
+                    merged = self._apply_delta(ticker, cached_frames[ticker], deltas[ticker])
+                if merged is None:
+                    full_fetch.append(ticker)
+                else:
+                    histories[ticker] = merged
+        
+        # 未保存・調整が検出されたティッカーは全期間を取得し直す
+        if full_fetch:
+            for ticker, history in self._download(full_fetch, period=self.history_period).items():
+                histories[ticker] = self._store_full(ticker, history)
+        
+        logger.info(
+            f"{len(histories)}/{len(tickers)}件の価格履歴を取得しました "
+            f"(差分: {len(cached_frames)}件, 全期間: {len(full_fetch)}件)"
+        )
+        return histories
+    
+    def get_latest_prices(self, tickers: List[str], interval: str = "1m") -> Dict[str, float]:
+        """
+        複数ティッカーの最新価格をまとめて取得する（分足の最終値）
+        
+        2回目以降は前回取得した最新の分足以降だけを取得します（前回の最終バーは
+        未確定の場合があるため取り直す）。新しいバーが無いティッカーは結果に含まれません。
+        前回の取得から1日以上空いた場合は当日の分足をすべて取得します。
+        
+        Args:
+            tickers: ティッカーシンボルのリスト
+            interval: 取得する足の間隔
+            
+        Returns:
+            ティッカー -> 最新価格の辞書（取得できなかったティッカーは含まない）
+        """
+        # 日中監視では毎回の取得が独立しているため、時間予算も取得ごとに始める
+        self.retry_policy.start()
+        tickers = list(dict.fromkeys(tickers))
+        last_bar_time = self._last_bar_time
+        if last_bar_time is None or pd.Timestamp.now(tz='UTC') - last_bar_time > pd.Timedelta(days=1):
+            bars = self._download(tickers, period="1d", interval=interval)
+        else:
+            bars = self._download(tickers, start=last_bar_time.to_pydatetime(), interval=interval)
+        
+        latest = {}
+        for ticker, frame in bars.items():
+            closes = frame['Close'].dropna()
+            if closes.empty:
+                continue
+            latest[ticker] = float(closes.iloc[-1])
+            bar_time = closes.index[-1]
+            bar_time = bar_time.tz_convert('UTC') if bar_time.tz is not None else bar_time.tz_localize('UTC')
+            if last_bar_time is None or bar_time > last_bar_time:
+                last_bar_time = bar_time
+        self._last_bar_time = last_bar_time
+        return latest
+    
+    def _download(self, tickers: List[str], **kwargs) -> Dict[str, pd.DataFrame]:
+        """yf.download()をチャンクごとに呼び出し、ティッカーごとのDataFrameに分割する"""
+        histories = {}
+        
+        for start in range(0, len(tickers), self.bulk_chunk_size):
+            chunk = tickers[start:start + self.bulk_chunk_size]
+            try:
+                data = self._request(
+                    partial(
+                        yf.download,
+                        chunk,
+                        group_by='ticker',
+                        auto_adjust=True,
+                        actions=True,
+                        threads=False,
+                        progress=False,
+                        **kwargs
+                    ),
+                    f"{len(chunk)}件の一括ダウンロード"
+                )
+            except Exception as e:
+                logger.error(f"一括ダウンロード中にエラーが発生しました ({len(chunk)}件): {str(e)}")
+                self.metrics.count('download_errors')
+                continue
+            
+            if data is None or data.empty:
+                continue
+            
+            available = set(data.columns.get_level_values(0))
+            for ticker in chunk:
+                if ticker not in available:
+                    continue
+                # 他の取引所の営業日に由来する空行を除く
+                histories[ticker] = data[ticker].dropna(how='all')
+        
+        return histories
+    
+    def _fetch_history(self, ticker: str, stock) -> pd.DataFrame:
+        """
+        1銘柄の価格履歴を取得する（price_cacheがあれば差分のみ取得）
+        
+        Args:
+            ticker: ティッカーシンボル
+            stock: yf.Tickerオブジェクト
+            
+        Returns:
+            history_period分の価格履歴
+        """
+        if self.price_cache is None:
+            return self._request(
+                partial(stock.history, period=self.history_period), f"{ticker} の価格履歴"
+            )
+        
+        cached = self.price_cache.load(ticker)
+        if cached is not None:
+            if self.price_cache.is_fresh(ticker):
+                return self._trim_history(cached)
+            
+            delta = self._request(
+                partial(stock.history, start=self._delta_start(cached)), f"{ticker} の価格履歴"
+            )
+            merged = self._apply_delta(ticker, cached, delta)
+            if merged is not None:
+                return merged
+        
+        history = self._request(
+            partial(stock.history, period=self.history_period), f"{ticker} の価格履歴"
+        )
+        return self._store_full(ticker, history)
+    
+    def _delta_start(self, cached: pd.DataFrame) -> str:
+        """差分取得の開始日（最終保存日の数日前から取り直して整合性を確認する）"""
+        start = cached.index[-1] - pd.Timedelta(days=self.overlap_days)
+        return start.strftime('%Y-%m-%d')
+    
+    def _trim_history(self, history: pd.DataFrame) -> pd.DataFrame:
+        """history_periodの範囲に切り詰める"""
+        if history.empty:
+            return history
+        start = period_start(history.index[-1], self.history_period)
+        if start is None:
+            return history
+        return history.loc[history.index >= start]
+    
+    def _store_full(self, ticker: str, history: pd.DataFrame) -> pd.DataFrame:
+        """全期間取得した価格履歴をキャッシュに保存する"""
+        if not history.empty:
+            self.price_cache.store(ticker, history, replace=True)
+        return history
+    
+    def _apply_delta(self, ticker: str, cached: pd.DataFrame,
+                     delta: pd.DataFrame) -> Optional[pd.DataFrame]:
+        """
+        差分取得したバーをキャッシュに統合する
+        
+        重複期間の終値がキャッシュと一致しない場合や、新しいバーに分割・配当が
+        含まれる場合は過去の調整後価格が変わっているため、全期間の再取得が
+        必要としてNoneを返します。差分は重複期間を含むため、空の場合は取得の失敗
+        （エラーにならずに空を返す制限など）とみなし、キャッシュを更新せずにNoneを返します。
+        
+        Args:
+            ticker: ティッカーシンボル
+            cached: キャッシュ済みの価格履歴
+            delta: 差分取得した価格履歴
+            
+        Returns:
+            統合後の価格履歴（再取得が必要な場合はNone）
+        """
+        if delta.empty:
+            logger.warning(f"{ticker} の差分取得が空だったため全期間を再取得します")
+            self.metrics.count('empty_deltas')
+            return None
+        
+        # 取得経路によってタイムゾーンの有無が異なるため、キャッシュ側に揃える
+        tz = getattr(cached.index, 'tz', None)
+        if getattr(delta.index, 'tz', None) is None:
+            if tz is not None:
+                delta = delta.tz_localize(tz)
+        else:
+            delta = delta.tz_convert(tz) if tz is not None else delta.tz_localize(None)
+        
+        cached_dates = cached.index.strftime('%Y-%m-%d')
+        delta_dates = delta.index.strftime('%Y-%m-%d')
+        
+        # 最終保存日のバーは取得時点で未確定の場合があるため比較から除く
+        overlap = delta_dates.isin(cached_dates[:-1])
+        if overlap.any():
+            old_close = cached['Close'].to_numpy()[cached_dates.isin(delta_dates[overlap])]
+            new_close = delta['Close'].to_numpy()[overlap]
+            if len(old_close) != len(new_close) or not np.allclose(old_close, new_close, rtol=1e-4):
+                logger.info(f"{ticker} の価格調整を検出したため全期間を再取得します")
+                return None
+        
+        new_bars = delta.loc[~delta_dates.isin(cached_dates[:-1])]
+        for column in ('Stock Splits', 'Dividends'):
+            if column in new_bars and (new_bars[column].fillna(0) != 0).any():
+                logger.info(f"{ticker} の分割・配当を検出したため全期間を再取得します")
+                return None
+        
+        merged = pd.concat([cached.loc[~cached_dates.isin(delta_dates)], delta]).sort_index()
+        merged = self._trim_history(merged)
+        self.price_cache.store(ticker, delta, keep_from=merged.index[0])
+        return merged
+    
+    def _request(self, func, description: str):
+        """
+        レート制限・再試行・サーキットブレーカーを通してyfinanceを呼び出す
+        
+        Args:
+            func: 引数なしで呼び出す関数
+            description: ログに出す呼び出しの説明
+            
+        Returns:
+            funcの戻り値
+        """
+        def attempt():
+            # 再試行も1回のリクエストとしてレート制限に数える
+            self.rate_limiter.acquire()
+            return func()
+        
+        return self.retry_policy.call(attempt, description)
+    
+    def _map(self, func, items: List) -> List:
+        """max_workersに応じて逐次またはスレッドプールでfuncを適用する（順序は保持）"""
+        if self.max_workers <= 1 or len(items) <= 1:
+            return [func(item) for item in items]
+        
+        workers = min(self.max_workers, len(items))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fetch") as executor:
+            return list(executor.map(func, items))
+    
     def calculate_price_change(self, stock_data: Dict) -> Dict:
         """
         価格変動を計算
@@ -107,7 +535,8 @@ class StockDataFetcher:
         if 'error' in stock_data or not stock_data.get('current_price'):
             return {}
         
-        current_price = stock_data['current_price']
+        # 終値はfloat32で保持しているため、差はfloat64で計算する（価格パネルの一括計算と揃える）
+        current_price = float(stock_data['current_price'])
         weekly_data = stock_data.get('weekly_data')
         monthly_data = stock_data.get('monthly_data')
         yearly_data = stock_data.get('yearly_data')
@@ -116,29 +545,29 @@ class StockDataFetcher:
         
         # 1週間の変動
         if weekly_data is not None and not weekly_data.empty:
-            week_ago_price = weekly_data['Close'].iloc[0]
+            week_ago_price = float(weekly_data['Close'].iloc[0])
             changes['week_change'] = {
                 'absolute': current_price - week_ago_price,
                 'percentage': ((current_price - week_ago_price) / week_ago_price) * 100,
-                'from_price': float(week_ago_price)
+                'from_price': week_ago_price
             }
         
         # 1ヶ月の変動
         if monthly_data is not None and not monthly_data.empty:
-            month_ago_price = monthly_data['Close'].iloc[0]
+            month_ago_price = float(monthly_data['Close'].iloc[0])
             changes['month_change'] = {
                 'absolute': current_price - month_ago_price,
                 'percentage': ((current_price - month_ago_price) / month_ago_price) * 100,
-                'from_price': float(month_ago_price)
+                'from_price': month_ago_price
             }
         
         # 1年の変動
         if yearly_data is not None and not yearly_data.empty:
-            year_ago_price = yearly_data['Close'].iloc[0]
+            year_ago_price = float(yearly_data['Close'].iloc[0])
             changes['year_change'] = {
                 'absolute': current_price - year_ago_price,
                 'percentage': ((current_price - year_ago_price) / year_ago_price) * 100,
-                'from_price': float(year_ago_price)
+                'from_price': year_ago_price
             }
         
         return changes
@@ -0,0 +1,167 @@
+"""
+株価データのレコードモジュール
+1銘柄分の会社情報と終値をコンパクトに保持します
+
+終値は float32 の配列1本だけを持ち、週次・月次・年次のデータは
+その配列へのオフセットから必要なときにDataFrameとして組み立てます。
+これまでの辞書と同じキーで読み出せるため、テンプレートや集計処理はそのまま使えます。
+"""
+import threading
+from collections.abc import Mapping
+from typing import Dict, Optional
+import numpy as np
+import pandas as pd
+
+# 会社情報のキーと属性名の対応（属性名に使えないキーのみ変換）
+FIELD_KEYS = {
+    'ticker': 'ticker',
+    'company_name': 'company_name',
+    'sector': 'sector',
+    'industry': 'industry',
+    'current_price': 'current_price',
+    'currency': 'currency',
+    'market_cap': 'market_cap',
+    'pe_ratio': 'pe_ratio',
+    'dividend_yield': 'dividend_yield',
+    '52_week_high': 'week52_high',
+    '52_week_low': 'week52_low',
+    'description': 'description',
+    'website': 'website',
+    'employees': 'employees',
+    'fetched_at': 'fetched_at',
+}
+
+# 価格データのキーと、その開始位置を持つ属性名
+WINDOW_KEYS = {
+    'current_data': '_current_start',
+    'weekly_data': '_week_start',
+    'monthly_data': '_month_start',
+    'yearly_data': '_year_start',
+}
+
+
+class IndexPool:
+    """同じ日付インデックスを銘柄間で共有するためのプール"""
+
+    def __init__(self):
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def intern(self, index: pd.DatetimeIndex) -> pd.DatetimeIndex:
+        """同じ内容のインデックスが登録済みであればそれを返す"""
+        if len(index) == 0:
+            return index
+        key = (len(index), index[0], index[-1], str(getattr(index, 'tz', None)))
+        with self._lock:
+            pooled = self._indexes.get(key)
+            if pooled is not None and pooled.equals(index):
+                return pooled
+            self._indexes[key] = index
+            return index
+
+    def clear(self) -> None:
+        with self._lock:
+            self._indexes.clear()
+
+
+class StockRecord(Mapping):
+    """1銘柄分の株価データ（get_stock_info()の辞書と同じキーで参照できる）"""
+
+    __slots__ = tuple(FIELD_KEYS.values()) + (
+        'dates', 'close', '_current_start', '_week_start', '_month_start', '_year_start',
+    )
+
+    def __init__(self, fields: Dict, dates: Optional[pd.DatetimeIndex] = None,
+                 close: Optional[np.ndarray] = None, week_start: int = 0,
+                 month_start: int = 0):
+        """
+        Args:
+            fields: 会社情報の辞書（FIELD_KEYSのキー）
+            dates: 終値の日付インデックス（1年分）
+            close: 終値の配列
+            week_start: 週次データの開始位置
+            month_start: 月次データの開始位置
+        """
+        for key, slot in FIELD_KEYS.items():
+            setattr(self, slot, fields.get(key))
+        self.dates = dates
+        self.close = close
+        n = 0 if close is None else len(close)
+        self._current_start = max(0, n - 1)
+        self._week_start = week_start
+        self._month_start = month_start
+        self._year_start = 0
+
+    @classmethod
+    def from_history(cls, fields: Dict, windows: Dict[str, pd.DataFrame],
+                     index_pool: Optional[IndexPool] = None) -> "StockRecord":
+        """
+        split_history()で切り出した各期間のデータからレコードを作成する
+
+        Args:
+            fields: 会社情報の辞書
+            windows: current_data / weekly_data / monthly_data / yearly_data の辞書
+            index_pool: 日付インデックスを共有するプール
+
+        Returns:
+            作成したレコード
+        """
+        yearly_data = windows['yearly_data']
+        dates = yearly_data.index
+        if index_pool is not None:
+            dates = index_pool.intern(dates)
+        close = yearly_data['Close'].to_numpy(dtype=np.float32)
+        n = len(close)
+        return cls(
+            fields, dates, close,
+            week_start=n - min(n, len(windows['weekly_data'])),
+            month_start=n - min(n, len(windows['monthly_data']))
+        )
+
+    def _window(self, key: str) -> Optional[pd.DataFrame]:
+        if self.close is None:
+            return None
+        start = getattr(self, WINDOW_KEYS[key])
+        return pd.DataFrame({'Close': self.close[start:]}, index=self.dates[start:])
+
+    @property
+    def current_data(self) -> Optional[pd.DataFrame]:
+        return self._window('current_data')
+
+    @property
+    def weekly_data(self) -> Optional[pd.DataFrame]:
+        return self._window('weekly_data')
+
+    @property
+    def monthly_data(self) -> Optional[pd.DataFrame]:
+        return self._window('monthly_data')
+
+    @property
+    def yearly_data(self) -> Optional[pd.DataFrame]:
+        return self._window('yearly_data')
+
+    def release_history(self) -> None:
+        """終値の配列を解放する（チャート描画後など、価格データが不要になったとき）"""
+        self.dates = None
+        self.close = None
+
+    def __getitem__(self, key: str):
+        if key in FIELD_KEYS:
+            return getattr(self, FIELD_KEYS[key])
+        if key in WINDOW_KEYS and self.close is not None:
+            return self._window(key)
+        raise KeyError(key)
+
+    def __iter__(self):
+        yield from FIELD_KEYS
+        if self.close is not None:
+            yield from WINDOW_KEYS
+
+    def __len__(self) -> int:
+        return len(FIELD_KEYS) + (len(WINDOW_KEYS) if self.close is not None else 0)
+
+    def __contains__(self, key) -> bool:
+        return key in FIELD_KEYS or (key in WINDOW_KEYS and self.close is not None)
+
+    def __repr__(self) -> str:
+        return f"StockRecord({self.ticker!r}, bars={0 if self.close is None else len(self.close)})"
@@ -0,0 +1,178 @@
+"""
+SVGチャートモジュール
+価格推移チャートと相関ヒートマップを、HTMLに直接埋め込めるSVG文字列として生成します
+
+価格推移は LTTB（Largest-Triangle-Three-Buckets）で形状を保ったまま点数を減らしてから
+描画するため、matplotlibを使わずに小さなチャートを高速に作成できます。
+"""
+from html import escape
+from typing import Tuple
+import numpy as np
+import pandas as pd
+
+# 価格推移チャートの大きさ（viewBoxの単位。表示幅はCSSでコンテナに合わせる）
+SVG_WIDTH = 600
+SVG_HEIGHT = 220
+SVG_PADDING = (16, 12, 28, 56)  # 上・右・下・左
+
+LINE_COLOR = '#3498db'
+
+
+def is_inline_chart(value) -> bool:
+    """チャートの値がファイルのパスではなく埋め込み用のSVGか（Jinjaのテストとしても使う）"""
+    return isinstance(value, str) and value.startswith('<svg')
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    LTTBで系列をthreshold点に間引く
+
+    最初と最後の点を残し、残りを threshold-2 個のバケットに分けて、各バケットから
+    前に選んだ点と次のバケットの平均点とで作る三角形の面積が最大になる点を選びます。
+    高値・安値などの形状を決める点が残りやすくなります。
+
+    Args:
+        x: X座標（単調増加）
+        y: Y座標
+        threshold: 残す点数（3未満、または系列がそれ以下の長さの場合は間引かない）
+
+    Returns:
+        (間引いたX座標, 間引いたY座標)
+    """
+    n = len(x)
+    if threshold < 3 or n <= threshold:
+        return x, y
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # 次のバケットの平均点（最後のバケットでは最後の点）
+        next_start, next_end = end, edges[i + 2] if i + 2 < len(edges) else n
+        if next_end <= next_start:
+            next_end = next_start + 1
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a])
+                      - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+
+    return x[selected], y[selected]
+
+
+def render_svg_chart(ticker: str, company_name: str, dates: np.ndarray,
+                     closes: np.ndarray, max_points: int = 200) -> str:
+    """
+    1銘柄の価格推移チャートをSVG文字列として作成する
+
+    Args:
+        ticker: ティッカーシンボル
+        company_name: 会社名
+        dates: 日付の配列
+        closes: 終値の配列
+        max_points: 描画する最大点数（LTTBで間引く）
+
+    Returns:
+        <svg>要素の文字列（描画する値が無い場合は空文字列）
+    """
+    closes = np.asarray(closes, dtype=float)
+    valid = ~np.isnan(closes)
+    dates = pd.DatetimeIndex(dates)[valid]
+    closes = closes[valid]
+    if len(closes) == 0:
+        return ''
+
+    # 休場日で間隔が空いても形が崩れないよう、X座標は日付ではなく本数にする
+    xs, ys = lttb(np.arange(len(closes), dtype=float), closes, max_points)
+
+    top, right, bottom, left = SVG_PADDING
+    plot_width = SVG_WIDTH - left - right
+    plot_height = SVG_HEIGHT - top - bottom
+    low, high = float(ys.min()), float(ys.max())
+    span = high - low or abs(high) or 1.0
+
+    px = left + xs / max(len(closes) - 1, 1) * plot_width
+    py = top + (high - ys) / span * plot_height
+    points = " ".join(f"{u:.1f},{v:.1f}" for u, v in zip(px, py))
+    baseline = top + plot_height
+    area = f"{left:.1f},{baseline:.1f} {points} {px[-1]:.1f},{baseline:.1f}"
+
+    label = escape(f"{company_name} ({ticker}) - 1 Year Price Trend")
+    first_date, last_date = dates[0].strftime('%Y-%m-%d'), dates[-1].strftime('%Y-%m-%d')
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {SVG_WIDTH} {SVG_HEIGHT}" '
+        f'role="img" style="width: 100%; height: auto;">'
+        f'<title>{label}</title>'
+        f'<line x1="{left}" y1="{top}" x2="{left + plot_width}" y2="{top}" stroke="#ecf0f1"/>'
+        f'<line x1="{left}" y1="{baseline}" x2="{left + plot_width}" y2="{baseline}" stroke="#bdc3c7"/>'
+        f'<polygon points="{area}" fill="{LINE_COLOR}" fill-opacity="0.2"/>'
+        f'<polyline points="{points}" fill="none" stroke="{LINE_COLOR}" stroke-width="2"/>'
+        f'<g font-family="DejaVu Sans, sans-serif" font-size="11" fill="#7f8c8d">'
+        f'<text x="{left - 6}" y="{top + 4}" text-anchor="end">{high:,.2f}</text>'
+        f'<text x="{left - 6}" y="{baseline}" text-anchor="end">{low:,.2f}</text>'
+        f'<text x="{left}" y="{SVG_HEIGHT - 8}">{first_date}</text>'
+        f'<text x="{left + plot_width}" y="{SVG_HEIGHT - 8}" text-anchor="end">{last_date}</text>'
+        f'</g></svg>'
+    )
+
+
+def _diverging_color(value: float) -> str:
+    """相関係数（-1〜1）を青・白・赤の色に変換する"""
+    if np.isnan(value):
+        return '#ecf0f1'
+    t = min(1.0, abs(value))
+    target = (192, 57, 43) if value >= 0 else (41, 128, 185)
+    r, g, b = (round(255 + (c - 255) * t) for c in target)
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+def render_svg_heatmap(matrix: pd.DataFrame, cell_size: int = 14) -> str:
+    """
+    相関行列のヒートマップをSVG文字列として作成する
+
+    Args:
+        matrix: correlation.analyze_correlation()のmatrix（クラスタ順の相関行列）
+        cell_size: 1セルの大きさ（viewBoxの単位）
+
+    Returns:
+        <svg>要素の文字列
+    """
+    labels = [escape(str(label)) for label in matrix.index]
+    n = len(labels)
+    margin = 8 + 7 * max(len(label) for label in labels)
+    size = margin + n * cell_size
+
+    cells = []
+    values = matrix.to_numpy(dtype=float)
+    for i in range(n):
+        for j in range(n):
+            cells.append(
+                f'<rect x="{margin + j * cell_size}" y="{margin + i * cell_size}" '
+                f'width="{cell_size}" height="{cell_size}" fill="{_diverging_color(values[i, j])}">'
+                f'<title>{labels[i]} / {labels[j]}: {values[i, j]:.2f}</title></rect>'
+            )
+    row_labels = "".join(
+        f'<text x="{margin - 4}" y="{margin + (i + 0.75) * cell_size:.1f}" text-anchor="end">{label}</text>'
+        for i, label in enumerate(labels)
+    )
+    column_labels = "".join(
+        f'<text transform="translate({margin + (j + 0.75) * cell_size:.1f},{margin - 4}) rotate(-90)">'
+        f'{label}</text>'
+        for j, label in enumerate(labels)
+    )
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {size} {size}" role="img" '
+        f'style="width: 100%; max-width: {max(size, 400)}px; height: auto;">'
+        f'<title>リターン相関ヒートマップ</title>'
+        f'{"".join(cells)}'
+        f'<g font-family="DejaVu Sans, sans-serif" font-size="10" fill="#2c3e50">'
+        f'{row_labels}{column_labels}</g></svg>'
+    )